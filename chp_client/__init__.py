@@ -4,20 +4,31 @@ Generic Client for Connections Hypothesis API.
 
 import types
 import copy
+import threading
 
 from chp_client.client import ChpClient
+from chp_client.async_client import AsyncChpClient
+from chp_client.session import build_session
 from chp_client._version import __version__
 
 # Function aliases common to all clients
 COMMON_ALIASES = {
         "_query": 'query',
         "_query_all": 'query_all',
+        "_query_many": 'query_many',
         "_predicates": 'predicates',
         "_curies": 'curies',
         "_versions": 'versions',
         "_get_outcome_prob": 'get_outcome_prob',
         "_get_ranked_wildcards": 'get_ranked_wildcards',
         "_constants": 'constants',
+        "_transfer_stats": 'transfer_stats',
+        "_hedging_stats": 'hedging_stats',
+        "_coalescing_stats": 'coalescing_stats',
+        "_endpoint_stats": 'endpoint_stats',
+        "_cache_stats": 'cache_stats',
+        "_invalidate": 'invalidate',
+        "_resolve_names": 'resolve_names',
         }
 
 # Set reasoner specific aliases
@@ -45,6 +56,8 @@ CLIENT_SETTINGS = {
                 "class_kwargs": DEFAULT_KWARGS,
                 "attr_aliases": COMMON_ALIASES,
                 "base_class": ChpClient,
+                "async_class_name": 'AsyncDefaultClient',
+                "async_base_class": AsyncChpClient,
                 "mixins": []
                 },
         }
@@ -61,32 +74,94 @@ def copy_func(f, name=None):
     return fn
 
 
-def get_client(client_id=None, instance=True, *args, **kwargs):
-    """ Function to return a new python client for the CHP API.
+# (client_id, async_, settings key) -> generated client class
+_CLASS_CACHE = {}
+_CLASS_CACHE_LOCK = threading.Lock()
 
-    Args:
-        reasoner_id: Optional reasoner id for spcific ARA use cases. Will run the chp/integrator/{ara handler}.py.
-            If left as None, default handler will be run.
-        instance: if True, return an instance of the derived client, if False return the class of the derived
-            client.
 
-    All other args/kwargs are passed to the derived client instantiation (if applicable).
+def _settings_key(settings, async_):
+    """ Returns a hashable snapshot of the settings a client class is generated from, so that
+    editing CLIENT_SETTINGS yields a new class rather than a stale cached one.
+    """
+    if async_:
+        class_name, base_class = settings["async_class_name"], settings["async_base_class"]
+    else:
+        class_name, base_class = settings["class_name"], settings["base_class"]
+    return (
+            class_name,
+            base_class,
+            tuple(settings["mixins"]),
+            tuple(sorted(settings["class_kwargs"].items())),
+            tuple(sorted(settings["attr_aliases"].items())),
+            )
+
+
+def _build_class(settings, async_):
+    if async_:
+        class_name, base_class = settings["async_class_name"], settings["async_base_class"]
+    else:
+        class_name, base_class = settings["class_name"], settings["base_class"]
+    _class = type(class_name, tuple([base_class] + settings["mixins"]), dict(settings["class_kwargs"]))
+    for (src_attr, target_attr) in settings["attr_aliases"].items():
+        if getattr(_class, src_attr, False):
+            setattr(_class, target_attr, copy_func(getattr(_class, src_attr), name=target_attr))
+    # Importable as chp_client.<class_name> (see __getattr__), so instances pickle by reference.
+    _class.__module__ = __name__
+    _class.__qualname__ = class_name
+    return _class
+
+
+def get_client_class(client_id=None, async_=False):
+    """ Returns the client class registered as client_id in CLIENT_SETTINGS. The class is only
+    generated once per client_id and settings, so repeated calls return the same class.
     """
     if client_id is None:
         client_id = 'default'
     client_id = client_id.lower()
     if client_id not in CLIENT_SETTINGS:
         raise Exception('No reasoner named {0}, currently available clients are {1}'.format(
-                reasoner_id, CLIENT_SETTINGS.keys()))
+                client_id, CLIENT_SETTINGS.keys()))
     _settings = CLIENT_SETTINGS[client_id]
-    _class = type(_settings["class_name"], tuple([_settings["base_class"]] + _settings["mixins"]), _settings["class_kwargs"])
-    for (src_attr, target_attr) in _settings["attr_aliases"].items():
-        if getattr(_class, src_attr, False):
-            setattr(_class, target_attr, copy_func(getattr(_class, src_attr), name=target_attr))
+    key = (client_id, async_, _settings_key(_settings, async_))
+    with _CLASS_CACHE_LOCK:
+        _class = _CLASS_CACHE.get(key)
+        if _class is None:
+            _class = _CLASS_CACHE[key] = _build_class(_settings, async_)
+    return _class
+
+
+def get_client(client_id=None, instance=True, *args, async_=False, **kwargs):
+    """ Function to return a new python client for the CHP API.
+
+    Args:
+        client_id: Optional reasoner id for spcific ARA use cases. Will run the chp/integrator/{ara handler}.py.
+            If left as None, default handler will be run.
+        instance: if True, return an instance of the derived client, if False return the class of the derived
+            client.
+        async_: if True, derive the client from the settings' async base class (AsyncChpClient) so that
+            the endpoint wrappers are awaitable.
+
+    All other args/kwargs are passed to the derived client instantiation (if applicable). For example,
+    pass session=build_session() to several get_client calls to have the clients share one connection pool.
+
+    Clients of one client_id share one class (see get_client_class), importable from chp_client under
+    its class name, e.g. chp_client.DefaultClient, so isinstance checks and pickling work.
+    """
+    _class = get_client_class(client_id, async_=async_)
     #TODO(Chase): Add docstring support
     _client = _class(*args, **kwargs) if instance else _class
     return _client
 
 
-class DefaultClient(get_client('default', instance=False)):
-    pass
+DefaultClient = get_client_class('default')
+AsyncDefaultClient = get_client_class('default', async_=True)
+
+
+def __getattr__(name):
+    # Exposes the class of every registered client, including ones added to CLIENT_SETTINGS later.
+    for client_id, settings in CLIENT_SETTINGS.items():
+        if settings["class_name"] == name:
+            return get_client_class(client_id)
+        if settings.get("async_class_name") == name:
+            return get_client_class(client_id, async_=True)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
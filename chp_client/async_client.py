@@ -0,0 +1,134 @@
+"""
+Asyncio variant of the CHP client.
+
+asyncio itself is only imported once a coroutine runs, so that importing chp_client (which builds
+the async client classes) stays cheap for synchronous users.
+"""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from chp_client.client import ChpClient
+from chp_client.deadline import Deadline
+from chp_client.exceptions import DeadlineExceeded
+
+# Default number of requests an async client keeps in flight.
+DEFAULT_CONCURRENCY = 10
+
+
+class AsyncChpClient(ChpClient):
+    """
+    The asyncio client for the CHP API web service.
+
+    Endpoint wrappers are coroutines. The blocking requests run on a dedicated thread pool that
+    shares the client's pooled session, so one event loop can keep many requests in flight
+    without forking worker processes.
+
+    Args:
+        url: overrides the default CHP url.
+        max_workers: the number of threads (and so concurrent requests) the client may use.
+            The owned connection pool is sized to match unless pool_maxsize is given.
+
+    All other kwargs are passed to ChpClient.
+    """
+
+    def __init__(self, url=None, max_workers=DEFAULT_CONCURRENCY, **kwargs):
+        kwargs.setdefault('pool_maxsize', max_workers)
+        super().__init__(url=url, **kwargs)
+        self._settings["max_workers"] = max_workers
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chp_client')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        super().close()
+
+    async def _run(self, func, *args, **kwargs):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, self, *args, **kwargs))
+
+    async def _query(self, q, **kwargs):
+        """ Awaitable version of ChpClient.query.
+        """
+        return await self._run(ChpClient._query, q, **kwargs)
+
+    async def _query_all(self, queries, **kwargs):
+        """ Awaitable version of ChpClient.query_all. Streaming (stream=True) is only supported by
+        the synchronous client, since consuming the stream would block the event loop.
+        """
+        if kwargs.get('stream', False):
+            raise ValueError('Streaming query_all is not supported by the async client.')
+        return await self._run(ChpClient._query_all, queries, **kwargs)
+
+    async def _predicates(self, verbose=True, **kwargs):
+        """ Awaitable version of ChpClient.predicates.
+        """
+        return await self._run(ChpClient._predicates, verbose=verbose, **kwargs)
+
+    async def _constants(self, verbose=True, **kwargs):
+        """ Awaitable version of ChpClient.constants.
+        """
+        return await self._run(ChpClient._constants, verbose=verbose, **kwargs)
+
+    async def _curies(self, verbose=True, **kwargs):
+        """ Awaitable version of ChpClient.curies.
+        """
+        return await self._run(ChpClient._curies, verbose=verbose, **kwargs)
+
+    async def _versions(self, verbose=True, **kwargs):
+        """ Awaitable version of ChpClient.versions.
+        """
+        return await self._run(ChpClient._versions, verbose=verbose, **kwargs)
+
+    async def _query_many(self, queries, concurrency=None, **kwargs):
+        """ Runs many queries keeping at most concurrency requests in flight and returns the
+        results in input order.
+
+        Args:
+            queries: an iterable of JSON TRAPI queries. It is consumed lazily, so a generator of
+                queries never has more than concurrency of them materialized at once.
+            concurrency: the number of requests to keep in flight, at most the client's max_workers
+                since every request runs on one of its threads. Default: max_workers.
+            deadline: a budget in seconds, or a chp_client.deadline.Deadline, shared by every query.
+                A query that can not be answered in time is not sent, and its result is the
+                DeadlineExceeded exception instead of raising it.
+
+        All other kwargs (e.g. timeout) are passed to query.
+        """
+        import asyncio
+        if concurrency is None:
+            concurrency = self._max_workers
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1.')
+        if concurrency > self._max_workers:
+            raise ValueError(
+                    'concurrency ({}) exceeds the client\'s max_workers ({}). Build the client with '
+                    'max_workers={} to keep that many requests in flight.'.format(
+                        concurrency, self._max_workers, concurrency))
+        kwargs["deadline"] = Deadline.coerce(kwargs.get('deadline'))
+        results = {}
+        pending = enumerate(queries)
+
+        async def _worker():
+            # Workers share one iterator, so each query is only taken once.
+            for i, q in pending:
+                try:
+                    results[i] = await self._query(q, **kwargs)
+                except DeadlineExceeded as ex:
+                    results[i] = ex
+
+        workers = [asyncio.ensure_future(_worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+        return [results[i] for i in range(len(results))]
@@ -0,0 +1,194 @@
+"""
+Client side load balancing over several CHP replicas.
+"""
+
+import threading
+import time
+
+# Replica selection strategies.
+EWMA = 'ewma'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+
+class Replica:
+    """ Routing state of one CHP replica.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.ewma_latency = None
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = None
+        self.probing = False
+
+    @property
+    def healthy(self):
+        return self.ejected_until is None
+
+    def to_dict(self):
+        return {
+                "url": self.url,
+                "healthy": self.healthy,
+                "ewma_latency": self.ewma_latency,
+                "outstanding": self.outstanding,
+                "requests": self.requests,
+                "failures": self.failures,
+                }
+
+
+class LoadBalancer:
+    """ Routes each request to the best healthy replica and ejects failing ones.
+
+    With the 'ewma' strategy the replica with the lowest ewma_latency * (outstanding + 1) is picked,
+    so both slow and busy replicas are avoided. With 'least_outstanding' the replica with the
+    fewest requests in flight is picked. Replicas with no latency sample yet count as the fastest so
+    that every replica gets tried, and a failure counts as a failure_penalty seconds latency sample so
+    that a failing replica stops looking fast.
+
+    A replica that fails eject_after times in a row is ejected. Once eject_timeout seconds have
+    passed it is re-probed in the background with probe(url), and it rejoins if the probe returns
+    True. Otherwise it stays ejected for twice as long, up to max_eject_timeout. Replicas that
+    route's available check rejects, e.g. because their circuit breaker is open, are skipped too.
+
+    Args:
+        urls: the base urls of the replicas.
+        probe: a function taking a replica base url and returning True if the replica is healthy.
+        strategy: 'ewma' or 'least_outstanding'.
+        alpha: the smoothing factor of the latency moving average.
+        eject_after: the number of consecutive failures that ejects a replica.
+        eject_timeout: the number of seconds before an ejected replica is first re-probed.
+        max_eject_timeout: the longest wait in seconds between probes of an ejected replica.
+        failure_penalty: the latency in seconds a failed request is recorded as.
+    """
+
+    def __init__(
+            self,
+            urls,
+            probe,
+            strategy=EWMA,
+            alpha=0.3,
+            eject_after=3,
+            eject_timeout=10.0,
+            max_eject_timeout=300.0,
+            failure_penalty=1.0,
+            ):
+        if not urls:
+            raise ValueError('At least one replica url is required.')
+        if strategy not in (EWMA, LEAST_OUTSTANDING):
+            raise ValueError('Unknown load balancing strategy {}.'.format(strategy))
+        self.replicas = [Replica(url) for url in urls]
+        self.probe = probe
+        self.strategy = strategy
+        self.alpha = alpha
+        self.eject_after = eject_after
+        self.eject_timeout = eject_timeout
+        self.max_eject_timeout = max_eject_timeout
+        self.failure_penalty = failure_penalty
+        self._eject_timeouts = {}
+        self._lock = threading.Lock()
+
+    def _score(self, replica):
+        if self.strategy == LEAST_OUTSTANDING:
+            return replica.outstanding
+        return (replica.ewma_latency or 0) * (replica.outstanding + 1)
+
+    def _start_due_probes(self):
+        now = time.monotonic()
+        for replica in self.replicas:
+            if not replica.healthy and not replica.probing and replica.ejected_until <= now:
+                replica.probing = True
+                threading.Thread(target=self._probe, args=(replica,), daemon=True).start()
+
+    def _probe(self, replica):
+        try:
+            healthy = self.probe(replica.url)
+        except Exception:
+            healthy = False
+        with self._lock:
+            replica.probing = False
+            if healthy:
+                replica.ejected_until = None
+                replica.consecutive_failures = 0
+                self._eject_timeouts.pop(replica.url, None)
+            else:
+                self._eject(replica)
+
+    def _eject(self, replica):
+        timeout = self._eject_timeouts.get(replica.url)
+        timeout = self.eject_timeout if timeout is None else min(timeout * 2, self.max_eject_timeout)
+        self._eject_timeouts[replica.url] = timeout
+        replica.ejected_until = time.monotonic() + timeout
+
+    def _rewrite(self, replica, url):
+        # Longest first, so that a base url that prefixes another one does not shadow it.
+        for base in sorted((r.url for r in self.replicas), key=len, reverse=True):
+            if url.startswith(base):
+                return replica.url + url[len(base):]
+        return url
+
+    def route(self, url, available=None, exclude=()):
+        """ Picks a replica for a request to url, a full url under any replica's base url, and returns
+        (replica, url rewritten onto that replica). Call release or cancel once the request is done.
+
+        Args:
+            available: an optional function taking the rewritten url and returning False if the
+                replica can not take the request right now, e.g. chp_client.retry.CircuitBreaker.available.
+            exclude: the urls of replicas not to pick, unless no other replica is left.
+        """
+        with self._lock:
+            self._start_due_probes()
+            pool = [r for r in self.replicas if r.url not in exclude] or self.replicas
+            healthy = [r for r in pool if r.healthy]
+            candidates = [r for r in healthy if available is None or available(self._rewrite(r, url))]
+            if not candidates:
+                candidates = healthy
+            if not candidates:
+                # Everything is ejected: rather than failing, use the one due back soonest.
+                candidates = [min(pool, key=lambda r: r.ejected_until)]
+            replica = min(candidates, key=self._score)
+            replica.outstanding += 1
+            replica.requests += 1
+        return replica, self._rewrite(replica, url)
+
+    def release(self, replica, latency=None, failed=False):
+        """ Records the outcome of a request routed to replica.
+
+        Args:
+            latency: the request latency in seconds, if it succeeded.
+            failed: True if the request failed (transport error or server error).
+        """
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.failures += 1
+                replica.consecutive_failures += 1
+                if replica.healthy and replica.consecutive_failures >= self.eject_after:
+                    self._eject(replica)
+                latency = max(self.failure_penalty, latency or 0)
+            else:
+                replica.consecutive_failures = 0
+                if not replica.healthy:
+                    # A fallback request to an ejected replica worked, so take it back right away.
+                    replica.ejected_until = None
+                    self._eject_timeouts.pop(replica.url, None)
+            if latency is not None:
+                if replica.ewma_latency is None:
+                    replica.ewma_latency = latency
+                else:
+                    replica.ewma_latency = self.alpha * latency + (1 - self.alpha) * replica.ewma_latency
+
+    def cancel(self, replica):
+        """ Releases a request routed to replica that neither succeeded nor failed on its side,
+        e.g. because it was never sent.
+        """
+        with self._lock:
+            replica.outstanding -= 1
+
+    def stats(self):
+        """ Returns the routing state of every replica.
+        """
+        with self._lock:
+            return [replica.to_dict() for replica in self.replicas]
@@ -0,0 +1,95 @@
+"""
+Chunking helpers for splitting large query_all batches into several requests.
+"""
+
+import json
+import threading
+
+# Default number of messages sent per query_all request.
+DEFAULT_CHUNK_SIZE = 100
+# Default per request latency (seconds) the adaptive chunk sizer aims for.
+DEFAULT_TARGET_LATENCY = 5.0
+
+
+class ChunkSizer:
+    """ Fixed number of messages per chunk.
+    """
+
+    def __init__(self, size=DEFAULT_CHUNK_SIZE):
+        if size < 1:
+            raise ValueError('Chunk size must be at least 1.')
+        self.size = size
+
+    def observe(self, n_messages, latency):
+        """ Records that a chunk of n_messages took latency seconds. A fixed sizer ignores it.
+        """
+        pass
+
+
+class AdaptiveChunkSizer(ChunkSizer):
+    """ Grows or shrinks the chunk size so that each request takes about target_latency seconds.
+
+    The per message latency is tracked with an exponentially weighted moving average and the size
+    moves towards target_latency / per message latency, at most doubling or halving per observation.
+
+    Args:
+        size: the initial chunk size.
+        target_latency: the per request latency in seconds to aim for.
+        min_size: the smallest chunk size allowed.
+        max_size: the largest chunk size allowed.
+        alpha: the smoothing factor of the moving average.
+    """
+
+    def __init__(
+            self,
+            size=DEFAULT_CHUNK_SIZE,
+            target_latency=DEFAULT_TARGET_LATENCY,
+            min_size=1,
+            max_size=10000,
+            alpha=0.3,
+            ):
+        super().__init__(size)
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.alpha = alpha
+        self._per_message = None
+        self._lock = threading.Lock()
+
+    def observe(self, n_messages, latency):
+        if n_messages < 1:
+            return
+        with self._lock:
+            per_message = latency / n_messages
+            if self._per_message is None:
+                self._per_message = per_message
+            else:
+                self._per_message = self.alpha * per_message + (1 - self.alpha) * self._per_message
+            if self._per_message <= 0:
+                ideal = self.max_size
+            else:
+                ideal = self.target_latency / self._per_message
+            ideal = min(max(ideal, self.size / 2, self.min_size), self.size * 2, self.max_size)
+            self.size = max(int(ideal), self.min_size)
+
+
+def iter_chunks(messages, sizer, max_bytes=None):
+    """ Yields consecutive lists of messages that respect the sizer's current size and, if given,
+    a budget of max_bytes of serialized JSON per chunk.
+
+    A message larger than max_bytes on its own is still sent, alone in its chunk. The size is read
+    from the sizer as each chunk is formed, so an adaptive sizer affects chunks not yet yielded.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for message in messages:
+        message_bytes = len(json.dumps(message)) if max_bytes is not None else 0
+        if chunk and (len(chunk) >= sizer.size
+                or (max_bytes is not None and chunk_bytes + message_bytes > max_bytes)):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(message)
+        chunk_bytes += message_bytes
+    if chunk:
+        yield chunk
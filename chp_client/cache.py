@@ -0,0 +1,347 @@
+"""
+Client scoped response cache: an in-memory LRU tier in front of a persistent sqlite tier.
+"""
+
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Seconds responses of each endpoint are cached for. None caches until the server version changes,
+# and 0 disables caching. Every entry is dropped when the server version changes.
+HOUR = 60 * 60
+DEFAULT_TTLS = {
+        "/query/": None,
+        "/queryall/": None,
+        "/curies/": 6 * HOUR,
+        "/predicates/": 6 * HOUR,
+        "/constants/": 6 * HOUR,
+        "/versions/": 0,
+        }
+
+DEFAULT_MAX_MEMORY_ENTRIES = 1000
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_ENTRIES = 100000
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+# Fraction of its bounds a full DiskCache frees at once.
+EVICTION_HEADROOM = 0.1
+
+
+def make_key(url, params):
+    """ Returns the cache key of a request to url with JSON params.
+    """
+    canonical = json.dumps([url, params], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """ Thread safe LRU of serialized responses bounded by entry count and total bytes.
+
+    Args:
+        max_entries: the maximum number of entries.
+        max_bytes: the maximum total size of the values.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_MEMORY_ENTRIES, max_bytes=DEFAULT_MAX_MEMORY_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        # key -> (endpoint, value, version, expires)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns (endpoint, value, version, expires) of key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, endpoint, value, version, expires):
+        with self._lock:
+            self._pop(key)
+            if len(value) > self.max_bytes:
+                return
+            self._entries[key] = (endpoint, value, version, expires)
+            self.bytes += len(value)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def invalidate(self, endpoint=None):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if endpoint is None or entry[0] == endpoint]:
+                self._pop(key)
+
+
+class DiskCache:
+    """ Thread safe sqlite store of serialized responses, evicting the least recently used entries
+    beyond max_entries or max_bytes. Several processes may share one file.
+
+    The entry count and total size are kept up to date in a one row usage table, so inserts cost
+    the same however large the store grows. Once a bound is crossed, entries are evicted until the
+    store is EVICTION_HEADROOM below both bounds, so that eviction runs once per batch of inserts.
+
+    Args:
+        path: the sqlite database file.
+        max_entries: the maximum number of entries.
+        max_bytes: the maximum total size of the values.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_DISK_ENTRIES, max_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            with self._transaction():
+                self._conn.execute(
+                        'CREATE TABLE IF NOT EXISTS responses ('
+                        'key TEXT PRIMARY KEY, endpoint TEXT, value BLOB, size INTEGER, '
+                        'version TEXT, expires REAL, accessed REAL)')
+                self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+                self._conn.execute(
+                        'CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                        'entries INTEGER, bytes INTEGER)')
+                # One scan for a store written before the usage table existed.
+                self._conn.execute(
+                        'INSERT OR IGNORE INTO usage SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses')
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # Immediate, so that concurrent writers in other processes queue up instead of deadlocking.
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _add_usage(self, entries, size):
+        self._conn.execute('UPDATE usage SET entries = entries + ?, bytes = bytes + ?', (entries, size))
+
+    def _delete(self, where, args):
+        entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE ' + where, args).fetchone()
+        if entries:
+            self._conn.execute('DELETE FROM responses WHERE ' + where, args)
+            self._add_usage(-entries, -size)
+
+    def get(self, key):
+        """ Returns (endpoint, value, version, expires) of key, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                    'SELECT endpoint, value, version, expires FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        return None if row is None else (row[0], bytes(row[1]), row[2], row[3])
+
+    def set(self, key, endpoint, value, version, expires):
+        with self._lock, self._transaction():
+            self._delete('key = ?', (key,))
+            self._conn.execute(
+                    'INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, endpoint, value, len(value), version, expires, time.time()))
+            self._add_usage(1, len(value))
+            self._evict(key)
+
+    def _evict(self, keep):
+        count, size = self._conn.execute('SELECT entries, bytes FROM usage').fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        max_entries = int(self.max_entries * (1 - EVICTION_HEADROOM))
+        max_bytes = int(self.max_bytes * (1 - EVICTION_HEADROOM))
+        # Walk the entries from least recently used until both lowered bounds hold, sparing the one
+        # just written.
+        doomed = []
+        freed = 0
+        rows = self._conn.execute('SELECT key, size FROM responses WHERE key != ? ORDER BY accessed', (keep,))
+        for key, entry_size in rows.fetchall():
+            if count <= max_entries and size <= max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+            freed += entry_size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+        self._add_usage(-len(doomed), -freed)
+        self.evictions += len(doomed)
+
+    def delete(self, key):
+        with self._lock, self._transaction():
+            self._delete('key = ?', (key,))
+
+    def invalidate(self, endpoint=None):
+        with self._lock, self._transaction():
+            if endpoint is None:
+                self._conn.execute('DELETE FROM responses')
+                self._conn.execute('UPDATE usage SET entries = 0, bytes = 0')
+            else:
+                self._delete('endpoint = ?', (endpoint,))
+
+    def usage(self):
+        """ Returns (number of entries, total bytes).
+        """
+        with self._lock:
+            return self._conn.execute('SELECT entries, bytes FROM usage').fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """ Response cache of one client (or several sharing it): a MemoryCache in front of an optional
+    DiskCache. Hits on disk are promoted to memory.
+
+    Entries are tagged with the server version they were fetched from and are ignored once it
+    changes. An endpoint's ttl additionally bounds how long its entries live.
+
+    Args:
+        path: the sqlite file of the disk tier, or None for a memory only cache.
+        ttls: a dictionary of endpoint path (e.g. '/curies/') to ttl in seconds, merged over
+            DEFAULT_TTLS. None caches until the server version changes and 0 disables caching.
+        default_ttl: the ttl of endpoints missing from ttls. Default: 0, not cached.
+        max_memory_entries: the entry bound of the memory tier.
+        max_memory_bytes: the size bound of the memory tier.
+        max_disk_entries: the entry bound of the disk tier.
+        max_disk_bytes: the size bound of the disk tier.
+    """
+
+    def __init__(
+            self,
+            path=None,
+            ttls=None,
+            default_ttl=0,
+            max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES,
+            max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+            max_disk_entries=DEFAULT_MAX_DISK_ENTRIES,
+            max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+            ):
+        self._init_kwargs = {
+                "path": path,
+                "ttls": ttls,
+                "default_ttl": default_ttl,
+                "max_memory_entries": max_memory_entries,
+                "max_memory_bytes": max_memory_bytes,
+                "max_disk_entries": max_disk_entries,
+                "max_disk_bytes": max_disk_bytes,
+                }
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.memory = MemoryCache(max_memory_entries, max_memory_bytes)
+        self.disk = None if path is None else DiskCache(path, max_disk_entries, max_disk_bytes)
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+
+    def __getstate__(self):
+        # A copy in another process starts with an empty memory tier over the same file.
+        return self._init_kwargs
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def cacheable(self, endpoint):
+        return self.ttl(endpoint) != 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key, version, record=True):
+        """ Returns the value cached under key for the server version, or None. With record False,
+        the lookup is left out of the hit and miss counts.
+        """
+        now = time.time()
+        entry = self.memory.get(key)
+        tier = 'memory'
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            tier = 'disk'
+        if entry is not None:
+            endpoint, value, entry_version, expires = entry
+            if entry_version == version and (expires is None or expires > now):
+                if tier == 'disk':
+                    self.memory.set(key, endpoint, value, entry_version, expires)
+                if record:
+                    self._count(tier + '_hits')
+                return value
+            # Stale: drop it from every tier.
+            self.memory.delete(key)
+            if self.disk is not None:
+                self.disk.delete(key)
+            self._count('expired')
+        if record:
+            self._count('misses')
+        return None
+
+    def set(self, key, endpoint, value, version):
+        """ Caches value (bytes) under key if the endpoint is cacheable.
+        """
+        ttl = self.ttl(endpoint)
+        if ttl == 0:
+            return
+        expires = None if ttl is None else time.time() + ttl
+        self.memory.set(key, endpoint, value, version, expires)
+        if self.disk is not None:
+            self.disk.set(key, endpoint, value, version, expires)
+        self._count('stores')
+
+    def invalidate(self, endpoint=None):
+        """ Drops every entry of endpoint (e.g. '/curies/'), or every entry if endpoint is None.
+        """
+        self.memory.invalidate(endpoint)
+        if self.disk is not None:
+            self.disk.invalidate(endpoint)
+
+    def stats(self):
+        """ Returns hit, miss and eviction counters and the size of each tier.
+        """
+        with self._lock:
+            stats = {name: self._counts[name] for name in ('memory_hits', 'disk_hits', 'misses', 'expired', 'stores')}
+        stats["memory_entries"] = len(self.memory)
+        stats["memory_bytes"] = self.memory.bytes
+        stats["memory_evictions"] = self.memory.evictions
+        if self.disk is not None:
+            stats["disk_entries"], stats["disk_bytes"] = self.disk.usage()
+            stats["disk_evictions"] = self.disk.evictions
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
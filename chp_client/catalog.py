@@ -0,0 +1,183 @@
+"""
+Local, indexed copy of a CHP endpoint's curie catalog.
+"""
+
+import hashlib
+import threading
+
+from chp_client.name_index import NameIndex, DEFAULT_MIN_SCORE, normalize_name
+from chp_client.snapshot import read_snapshot, write_snapshot
+
+
+def _entries(curies):
+    """ Yields (category, curie, name) from a /curies/ payload, which maps each category to either
+    {curie: name} or a list of {"curie": ..., "name": ...}.
+    """
+    for category, members in curies.items():
+        if isinstance(members, dict):
+            for curie, name in members.items():
+                if isinstance(name, dict):
+                    name = name.get('name')
+                yield category, curie, name
+        else:
+            for member in members:
+                yield category, member.get('curie'), member.get('name')
+
+
+class CurieCatalog:
+    """ The curies a CHP endpoint supports, indexed by curie, by name and by category.
+
+    The catalog is downloaded once and kept as an on-disk snapshot (see chp_client.snapshot)
+    together with the endpoint's /versions/ answer. It is only downloaded again when /versions/,
+    read again every version_ttl of the client, reports different versions, or on refresh().
+
+    Args:
+        client: the ChpClient whose endpoint the catalog mirrors.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self._versions = None
+        self._by_curie = None
+        self._by_name = None
+        self._by_category = None
+        self._name_index = None
+
+    @property
+    def _snapshot_name(self):
+        return 'curies-{}'.format(hashlib.sha1(self._client.url.encode('utf-8')).hexdigest()[:16])
+
+    def _current_versions(self):
+        self._client._ensure_version()
+        # Read again every version_ttl, so that a long lived client notices upgrades.
+        return self._client._current_versions()
+
+    def _load(self, force=False):
+        versions = self._current_versions()
+        with self._lock:
+            if not force and self._by_curie is not None and self._versions == versions:
+                return
+            curies = None
+            if not force:
+                snapshot, _ = read_snapshot(self._snapshot_name)
+                if snapshot is not None and snapshot.get('versions') == versions:
+                    curies = snapshot['curies']
+            if curies is None:
+                # Go through _get directly, since the _curies of async clients is awaitable.
+                client = self._client
+                _, curies = client._get(
+                        client.url + client._curies_endpoint,
+                        params={"client_id": client._client_id},
+                        verbose=False,
+                        )
+                write_snapshot(self._snapshot_name, {"versions": versions, "curies": curies})
+            self._index(curies)
+            self._versions = versions
+
+    def _index(self, curies):
+        by_curie, by_name, by_category = {}, {}, {}
+        for category, curie, name in _entries(curies):
+            entry = by_curie.get(curie)
+            if entry is None:
+                entry = by_curie[curie] = {"curie": curie, "name": name, "categories": []}
+                if name:
+                    by_name.setdefault(normalize_name(name), []).append(entry)
+            entry["categories"].append(category)
+            by_category.setdefault(category, []).append(curie)
+        self._by_curie, self._by_name, self._by_category = by_curie, by_name, by_category
+        self._name_index = None
+
+    def refresh(self):
+        """ Downloads the catalog again, whatever the endpoint versions.
+        """
+        self._load(force=True)
+
+    def __len__(self):
+        self._load()
+        return len(self._by_curie)
+
+    def __contains__(self, curie):
+        self._load()
+        return curie in self._by_curie
+
+    def entries(self):
+        """ Returns every entry, a dictionary of curie, name and categories.
+        """
+        self._load()
+        return list(self._by_curie.values())
+
+    def categories(self):
+        """ Returns the categories in the catalog.
+        """
+        self._load()
+        return list(self._by_category)
+
+    def members(self, category):
+        """ Returns the curies of category.
+        """
+        self._load()
+        return list(self._by_category.get(category, []))
+
+    def name(self, curie):
+        """ Returns the name of curie, or None if it is not in the catalog.
+        """
+        self._load()
+        entry = self._by_curie.get(curie)
+        return None if entry is None else entry["name"]
+
+    def lookup(self, curie=None, name=None, category=None):
+        """ Returns the entries (dictionaries of curie, name and categories) matching every given
+        criterion. Names match case insensitively and ignoring repeated whitespace.
+
+        Example:
+            client.catalog.lookup(name='raf1', category='biolink:Gene')
+            [{'curie': 'ENSEMBL:ENSG00000132155', 'name': 'RAF1', 'categories': ['biolink:Gene']}]
+        """
+        self._load()
+        if curie is not None:
+            entry = self._by_curie.get(curie)
+            candidates = [] if entry is None else [entry]
+        elif name is not None:
+            candidates = self._by_name.get(normalize_name(name), [])
+        elif category is not None:
+            candidates = [self._by_curie[c] for c in self._by_category.get(category, [])]
+        else:
+            candidates = list(self._by_curie.values())
+        return [
+                dict(entry, categories=list(entry["categories"]))
+                for entry in candidates
+                if (name is None or (entry["name"] and normalize_name(entry["name"]) == normalize_name(name)))
+                and (category is None or category in entry["categories"])
+                ]
+
+    def _names(self):
+        self._load()
+        with self._lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(self._by_curie.values())
+            return self._name_index
+
+    def search(self, name, category=None, limit=10, min_score=DEFAULT_MIN_SCORE):
+        """ Returns up to limit entries whose names resemble name, best first, each with a similarity
+        between 0 and 1 under "score". See chp_client.name_index.NameIndex.search.
+
+        Example:
+            client.catalog.search('raf-1', category='biolink:Gene', limit=1)
+            [{'curie': 'ENSEMBL:ENSG00000132155', 'name': 'RAF1', 'categories': ['biolink:Gene'], 'score': 0.545...}]
+        """
+        return self._names().search(name, category=category, limit=limit, min_score=min_score)
+
+    def complete(self, prefix, category=None, limit=10):
+        """ Returns up to limit entries whose names start with prefix, shortest names first.
+        """
+        return self._names().complete(prefix, category=category, limit=limit)
+
+    def resolve_names(self, names, category=None, min_score=DEFAULT_MIN_SCORE):
+        """ Returns the curie best matching each of names, or None where nothing matches well enough.
+
+        Example:
+            client.catalog.resolve_names(['raf1', 'cyclophosphamid'])
+            ['ENSEMBL:ENSG00000132155', 'CHEMBL:CHEMBL88']
+        """
+        return self._names().resolve_names(names, category=category, min_score=min_score)
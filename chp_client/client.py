@@ -3,78 +3,747 @@ Python Client for generic CHP API services.
 """
 
 from collections import defaultdict
-from chp_client._version import __version__
+from requests.exceptions import Timeout
+from chp_client.batching import (
+        ChunkSizer,
+        AdaptiveChunkSizer,
+        iter_chunks,
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_TARGET_LATENCY,
+        )
+from chp_client.cache import TieredCache, make_key
+from chp_client.catalog import CurieCatalog
+from chp_client.name_index import DEFAULT_MIN_SCORE
+from chp_client.compression import (
+        TransferStats,
+        check_algorithm,
+        compress,
+        iter_compress,
+        iter_counted,
+        accept_encoding as default_accept_encoding,
+        )
+from chp_client import ranking
+from chp_client.concurrency import bounded_map
+from chp_client.deadline import Deadline, request_timeout
+from chp_client.hedging import Hedger
+from chp_client.encoding import iter_json_bytes
+from chp_client.balancer import LoadBalancer, EWMA
+from chp_client.fingerprint import canonicalize, relabel_response
+from chp_client.exceptions import ChpResponseError, CircuitOpenError, DeadlineExceeded, VersionMismatchError
+from chp_client.handshake import (
+        cached_versions,
+        save_versions,
+        check_versions,
+        DEFAULT_HANDSHAKE_TTL,
+        DEFAULT_VERSION_TTL,
+        VERSION_CHECK_MODES,
+        EAGER,
+        BACKGROUND,
+        OFF,
+        )
+from chp_client.ratelimit import TokenBucket
+from chp_client.retry import RetryPolicy, CircuitBreakerRegistry, RETRYABLE_EXCEPTIONS
+from chp_client.streaming import iter_json_array_items, DEFAULT_READ_CHUNK_SIZE
+from chp_client.session import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+from chp_client.singleflight import SingleFlight
+from chp_client.snapshot import cache_dir
+from chp_client.transport import RequestsTransport
 
-import requests
-import sys
-import warnings
+import os
+import json
+import threading
+import time
 import copy
 
-try:
-    import requests_cache
-    caching_avail = True
-except ImportError:
-    caching_avail = False
+# Seconds to wait for a replica's versions endpoint when re-probing it.
+DEFAULT_PROBE_TIMEOUT = 5
+
+# Name of the response cache database set_caching uses when none is given, under cache_dir().
+DEFAULT_CACHE_NAME = 'chp_cache'
+
 
 class ChpClient:
     """
     The client for the CHP API web service.
+
+    Args:
+        url: overrides the default CHP url.
+        session: an optional requests session (see chp_client.session.build_session) to share one
+            connection pool between several clients. If None, the client builds and owns its own.
+        transport: an optional chp_client.transport.Transport to send requests with instead of the
+            default requests based one, e.g. chp_client.transport.Http2Transport. The session and
+            pool arguments are then ignored, and the transport may be shared between clients.
+        pool_connections: the number of distinct host pools kept by an owned session.
+        pool_maxsize: the maximum number of keep-alive connections per host of an owned session.
+        pool_block: if True, an owned session waits for a free connection instead of opening
+            more than pool_maxsize connections to one host.
+        stream_requests: if True, POST bodies are encoded incrementally and sent with chunked
+            transfer-encoding instead of being serialized into one string first.
+        compression: if 'gzip' or 'zstd' (requires zstandard), POST bodies are compressed and sent
+            with a matching Content-Encoding. Default: None, bodies are sent uncompressed.
+        compression_level: the compression level. Default: 6 for gzip, 3 for zstd.
+        accept_encoding: the Accept-Encoding header sent with every request. Default: every
+            encoding the transport can decode.
+        retry_policy: a chp_client.retry.RetryPolicy deciding which failed requests are retried and
+            how long to back off. Default: RetryPolicy(), three attempts with jittered exponential
+            backoff. Use RetryPolicy(attempts=1) to disable retries.
+        circuit_breakers: a chp_client.retry.CircuitBreakerRegistry holding one breaker per endpoint.
+            Share a registry between clients to share breaker state. Default: a registry owned by
+            the client.
+        hedging: an optional chp_client.hedging.Hedger, or True for one owned by the client. If given,
+            a request that is slower than the Hedger's latency percentile is sent a second time and
+            the first answer is used. A Hedger passed in may be shared between clients.
+        urls: an optional list of replica urls. If given, every request is routed to the best
+            healthy replica, failing replicas are ejected and re-probed through /versions/, and url
+            is ignored.
+        balancing: how replicas are picked, 'ewma' (latency moving average times requests in
+            flight) or 'least_outstanding'. Default: 'ewma'.
+        rate_limit: caps the requests sent by every endpoint wrapper. Either a number of requests
+            per second, or a limiter object such as chp_client.ratelimit.SharedTokenBucket to share
+            one budget between clients, threads and processes. A limiter's acquire takes a timeout
+            when the request has a deadline. Default: None, no limit.
+        rate_burst: the burst size when rate_limit is a number. Default: max(1, rate_limit).
+        timeout: the default number of seconds to wait for the server on every request, which
+            endpoint wrappers taking a timeout argument may override. Default: None, wait forever.
+        version_check: when to check that the endpoint expects this chp_client version. 'eager'
+            checks while constructing the client, 'lazy' before the first request, 'background' on
+            a thread started by the constructor (the first request waits for it), and 'off' never.
+            A mismatch raises chp_client.exceptions.VersionMismatchError. Default: 'eager'.
+        handshake_ttl: the number of seconds a successful check of an endpoint is reused, by every
+            client in this process and, through an on-disk snapshot, by new processes.
+            Default: 3600.
+        version_ttl: the number of seconds between reads of the endpoint's /versions/ that tag
+            cached responses and the curie catalog, so that a server upgrade invalidates them even
+            in a long-lived client. It is read whatever version_check says. Default: 60.
+        cache: an optional chp_client.cache.TieredCache of responses, which may be shared between
+            clients. See also _set_caching.
+        coalesce: if True, concurrent requests for the same query (up to renaming of query graph
+            nodes and edges) share a single round trip. Pass a chp_client.singleflight.SingleFlight
+            to coalesce across clients, or False to send every request. Default: True.
     """
 
-    def __init__(self, url=None):
+    def __init__(
+            self,
+            url=None,
+            session=None,
+            transport=None,
+            pool_connections=DEFAULT_POOL_CONNECTIONS,
+            pool_maxsize=DEFAULT_POOL_MAXSIZE,
+            pool_block=False,
+            stream_requests=False,
+            compression=None,
+            compression_level=None,
+            accept_encoding=None,
+            retry_policy=None,
+            circuit_breakers=None,
+            hedging=None,
+            urls=None,
+            balancing=EWMA,
+            rate_limit=None,
+            rate_burst=None,
+            timeout=None,
+            version_check=EAGER,
+            handshake_ttl=DEFAULT_HANDSHAKE_TTL,
+            version_ttl=DEFAULT_VERSION_TTL,
+            cache=None,
+            coalesce=True,
+            ):
 
+        # What a copy in another process is rebuilt from (see __reduce__). A shared session can not
+        # follow, so the copy owns its own pool.
+        self._settings = {
+                "url": url,
+                "transport": transport,
+                "pool_connections": pool_connections,
+                "pool_maxsize": pool_maxsize,
+                "pool_block": pool_block,
+                "stream_requests": stream_requests,
+                "compression": compression,
+                "compression_level": compression_level,
+                "accept_encoding": accept_encoding,
+                "retry_policy": retry_policy,
+                "circuit_breakers": circuit_breakers,
+                "hedging": hedging,
+                "urls": urls,
+                "balancing": balancing,
+                "rate_limit": rate_limit,
+                "rate_burst": rate_burst,
+                "timeout": timeout,
+                "version_check": version_check,
+                "handshake_ttl": handshake_ttl,
+                "version_ttl": version_ttl,
+                "cache": cache,
+                "coalesce": coalesce,
+                }
+        if urls:
+            url = urls[0]
         if url is None:
             url = self._default_url
         self.url = url
-        self._cached = False
-
-        # check for appropriate version
-        package_versions = self._versions(verbose=True)
-        endpoint_version = package_versions['chp_client']
-        endpoint_version_split = [int(x) for x in endpoint_version.split('.')]
-        local_version_split = [int(x) for x in __version__.split('.')]
-        if endpoint_version_split[0] != local_version_split[0]:
-            sys.exit('Major version deviation in chp_client. Please update chp_client to grab the newest version')
-        elif endpoint_version_split[1] != local_version_split[1]:
-            sys.exit('Minor version deviation in chp_client. Please update chp_client to grab the newest version')
-        elif endpoint_version_split[2] != local_version_split[2]:
-            warnings.warn('Patch version deviation in chp_client. Please update chp_client to grab the newest version or run at your own risk!')
-
-    def _get(self, url, params=None, verbose=True):
+        self._cache = cache
+        self._owns_cache = False
+        self._cache_config = None
+        self._pool_kwargs = {
+                "pool_connections": pool_connections,
+                "pool_maxsize": pool_maxsize,
+                "pool_block": pool_block,
+                }
+        self._stream_requests = stream_requests
+        if compression is not None:
+            check_algorithm(compression)
+        self._compression = compression
+        self._compression_level = compression_level
+        self._accept_encoding = accept_encoding or default_accept_encoding()
+        self._stats = TransferStats()
+        self._retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self._circuit_breakers = CircuitBreakerRegistry() if circuit_breakers is None else circuit_breakers
+        self._owns_hedger = hedging is True
+        self._hedger = Hedger() if hedging is True else (hedging or None)
+        self._timeout = timeout
+        self._catalog = None
+        if coalesce is True:
+            coalesce = SingleFlight()
+        self._single_flight = coalesce or None
+        if rate_limit is None or hasattr(rate_limit, 'acquire'):
+            self._rate_limiter = rate_limit
+        else:
+            self._rate_limiter = TokenBucket(rate_limit, rate_burst)
+        self._balancer = None
+        if urls:
+            # Re-probe an ejected replica when its breakers let a trial request through.
+            self._balancer = LoadBalancer(
+                    urls, self._probe, strategy=balancing, eject_timeout=self._circuit_breakers.reset_timeout)
+        self._owns_transport = transport is None
+        if transport is None:
+            transport = RequestsTransport(session=session, **self._pool_kwargs)
+        self._transport = transport
+        if version_check not in VERSION_CHECK_MODES:
+            raise ValueError('version_check must be one of {}.'.format(', '.join(VERSION_CHECK_MODES)))
+        self._handshake_ttl = handshake_ttl
+        self._version_ttl = version_ttl
+        self._handshake = None
+        self._handshake_error = None
+        self._handshake_lock = threading.Lock()
+        self._version_check = version_check
+        if version_check == OFF:
+            self._handshake = {}
+        elif version_check == EAGER:
+            self._ensure_version()
+        elif version_check == BACKGROUND:
+            threading.Thread(target=self._background_version_check, name='chp_client_handshake', daemon=True).start()
+
+    def __reduce__(self):
+        """ Pickles the client as its settings, caching setup and version handshake, but not its open
+        connections, so that it can be handed to a process pool. The copy opens its own connections
+        on first use.
+        """
+        state = {
+                "handshake": self._handshake if self._handshake_error is None else None,
+                "cache_config": self._cache_config,
+                }
+        return _rebuild_client, (self.__class__, self._settings, state)
+
+    def _check_version(self):
+        """ Checks the local chp_client version against the one the endpoint expects and returns the
+        endpoint's versions. A recent answer cached in memory or on disk is used if there is one.
+
+        Raises:
+            VersionMismatchError: if the major or minor versions differ.
+        """
+        package_versions = cached_versions(self.url, self._handshake_ttl)
+        if package_versions is None:
+            # Go through _get directly so subclasses may make _versions awaitable.
+            _, package_versions = self._get(self.url + self._versions_endpoint, check_version=False)
+            check_versions(package_versions, self.url)
+            save_versions(self.url, package_versions)
+        else:
+            check_versions(package_versions, self.url)
+        return package_versions
+
+    def _ensure_version(self):
+        """ Runs the version handshake unless it already succeeded, and re-raises a mismatch found
+        by a background check.
+        """
+        if self._handshake_error is not None:
+            raise self._handshake_error
+        if self._handshake is not None:
+            return
+        with self._handshake_lock:
+            if self._handshake is None:
+                self._handshake = self._check_version()
+
+    def _current_versions(self, timeout=None, deadline=None):
+        """ Returns the endpoint's /versions/ answer, read again once it is older than version_ttl.
+        Unlike the handshake this does not check compatibility, and it runs even if version_check
+        is 'off'.
+        """
+        versions = cached_versions(self.url, self._version_ttl)
+        if versions is None:
+            res = self._send(
+                    'GET', self.url + self._versions_endpoint, {}, compress_body=False, timeout=timeout,
+                    deadline=deadline, check_version=False)
+            versions = self._read_json(res)
+            if res.status_code != 200:
+                raise ChpResponseError(res.url, res.status_code, res.text)
+            save_versions(self.url, versions)
+        return versions
+
+    def _background_version_check(self):
+        try:
+            self._ensure_version()
+        except VersionMismatchError as ex:
+            self._handshake_error = ex
+        except Exception:
+            # E.g. the endpoint is unreachable: the first request checks again.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Closes the pooled connections of the client's transport if the client owns it.
+        The same goes for its response cache and Hedger. Shared sessions, transports, caches and
+        Hedgers are left open for the other clients using them.
+        """
+        if self._owns_transport:
+            self._transport.close()
+        if self._owns_cache:
+            self._cache.close()
+        if self._owns_hedger:
+            self._hedger.close()
+
+    def _encode_body(self, params, compress_body=True):
+        """ Returns the (data, headers) of a JSON request body, encoded per the client's streaming
+        and compression settings, and tallies its logical and wire sizes.
+        """
+        headers = {
+                "Content-Type": 'application/json',
+                "Accept-Encoding": self._accept_encoding,
+                }
+        compression = self._compression if compress_body else None
+        if compression is not None:
+            headers["Content-Encoding"] = compression
+        if self._stream_requests:
+            data = iter_counted(iter_json_bytes(params), lambda n: self._stats.record_sent(0, n))
+            if compression is not None:
+                data = iter_compress(data, compression, self._compression_level)
+            data = iter_counted(data, lambda n: self._stats.record_sent(n, 0))
+        else:
+            data = json.dumps(params).encode('utf-8')
+            logical_bytes = len(data)
+            if compression is not None:
+                data = compress(data, compression, self._compression_level)
+            self._stats.record_sent(len(data), logical_bytes)
+        return data, headers
+
+    def _read_json(self, res):
+        """ Reads and decodes a whole JSON response body, tallying its wire and logical sizes.
+        """
+        content = res.content
+        self._stats.record_received(self._transport.wire_bytes(res, len(content)), len(content))
+        try:
+            return res.json()
+        except ValueError:
+            # E.g. an HTML error page from a proxy in front of the endpoint.
+            raise ChpResponseError(res.url, res.status_code, res.text)
+
+    def _send(
+            self,
+            method,
+            url,
+            params,
+            compress_body=True,
+            stream=False,
+            timeout=None,
+            deadline=None,
+            check_version=True,
+            ):
+        """ Sends a JSON request through the load balancer (if any), the endpoint's circuit breaker
+        and the retry policy and returns the response.
+
+        Args:
+            timeout: the number of seconds to wait for the server per attempt. Default: the
+                client's timeout.
+            deadline: an optional chp_client.deadline.Deadline. Every attempt's timeout is capped by
+                the time left, and no attempt or backoff is started past it.
+            check_version: if True, run a deferred version handshake first.
+
+        Raises:
+            CircuitOpenError: if the endpoint's breaker is open (on every replica).
+            ChpResponseError: if the endpoint still answers with a server error after the last retry.
+            DeadlineExceeded: if the deadline passed before a response arrived.
+            VersionMismatchError: if the deferred version handshake fails.
+        """
+        if check_version:
+            self._ensure_version()
+        if timeout is None:
+            timeout = self._timeout
+        attempt = 0
+        # Replicas whose breaker turned out to be open for this request.
+        unavailable = set()
+        while True:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(deadline)
+            # Route every attempt afresh so that a retry can fail over to another replica.
+            if self._balancer is None:
+                replica, target = None, url
+            else:
+                replica, target = self._balancer.route(
+                        url, available=self._breaker_available, exclude=unavailable)
+            breaker = self._circuit_breakers.get(target)
+
+            try:
+                # Encoded before the breaker admits the request, so that a payload that can not be
+                # encoded is not the endpoint's fault.
+                bodies = [self._encode_body(params, compress_body=compress_body)]
+            except Exception:
+                self._cancel(replica)
+                raise
+
+            def _request():
+                try:
+                    data, headers = bodies.pop()
+                except IndexError:
+                    # A hedge: a streamed body can only be read once, so encode it again.
+                    data, headers = self._encode_body(params, compress_body=compress_body)
+                if self._rate_limiter is not None:
+                    if deadline is None:
+                        self._rate_limiter.acquire()
+                    elif not self._rate_limiter.acquire(timeout=deadline.remaining()):
+                        # Waiting for a token would overrun the budget.
+                        raise DeadlineExceeded(deadline)
+                self._stats.record_request()
+                # Computed last, after any wait for the rate limiter.
+                return self._transport.request(
+                        method, target, data=data, headers=headers, stream=stream,
+                        timeout=request_timeout(timeout, deadline))
+
+            start = time.monotonic()
+            try:
+                # Admitted once for the primary and its hedge, so that a hedge of a half open
+                # breaker's trial request is not turned away.
+                breaker.before_request()
+                res = _request() if self._hedger is None else self._hedger.run(_request)
+            except CircuitOpenError:
+                # The replica is unavailable rather than failing or healthy.
+                self._cancel(replica)
+                if replica is None:
+                    raise
+                unavailable.add(replica.url)
+                if len(unavailable) >= len(self._balancer.replicas):
+                    raise
+                continue
+            except RETRYABLE_EXCEPTIONS as ex:
+                if deadline is not None and deadline.expired:
+                    # The caller's budget cut the request short, which says nothing about the
+                    # endpoint's health.
+                    breaker.record_abort()
+                    self._cancel(replica)
+                    raise DeadlineExceeded(deadline) from ex
+                breaker.record_failure()
+                self._release(replica, failed=True)
+                if not self._retry_policy.should_retry_exception(method, ex, attempt):
+                    raise
+                delay = self._retry_policy.delay(attempt)
+            except Exception:
+                # E.g. a TypeError from a payload that is not JSON serializable: a bug of the
+                # caller, which says nothing about the endpoint's health.
+                breaker.record_abort()
+                self._cancel(replica)
+                raise
+            else:
+                failed = res.status_code >= 500
+                if failed:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                self._release(replica, latency=time.monotonic() - start, failed=failed)
+                if not self._retry_policy.should_retry_status(method, res.status_code, attempt):
+                    if failed:
+                        raise ChpResponseError(target, res.status_code, res.text)
+                    return res
+                delay = self._retry_policy.delay(attempt, res.headers.get('Retry-After'))
+                res.close()
+            if deadline is not None and delay >= deadline.remaining():
+                # The retry could not start in time, so give up now rather than sleep past it.
+                raise DeadlineExceeded(deadline)
+            attempt += 1
+            time.sleep(delay)
+
+    def _release(self, replica, latency=None, failed=False):
+        if replica is not None:
+            self._balancer.release(replica, latency=None if failed else latency, failed=failed)
+
+    def _breaker_available(self, target):
+        return self._circuit_breakers.get(target).available()
+
+    def _cancel(self, replica):
+        if replica is not None:
+            self._balancer.cancel(replica)
+
+    def _probe(self, url):
+        """ Returns True if the replica at base url answers its versions endpoint.
+        """
+        try:
+            res = self._transport.request('GET', url + self._versions_endpoint, timeout=DEFAULT_PROBE_TIMEOUT)
+        except RETRYABLE_EXCEPTIONS:
+            return False
+        return res.status_code == 200
+
+    def _endpoint_stats(self):
+        """ Returns the routing state (health, latency moving average, requests in flight) of every
+        replica, or None if the client talks to a single url.
+        """
+        if self._balancer is None:
+            return None
+        return self._balancer.stats()
+
+    def _endpoint(self, url):
+        """ Returns the endpoint path (e.g. '/query/') of a full url.
+        """
+        return url[len(self.url):] if url.startswith(self.url) else url
+
+    def _cached_request(self, method, url, params, **send_kwargs):
+        """ Sends a JSON request through the client's response cache and request coalescing and
+        returns (from_cache, response JSON). Only successful responses are cached.
+        """
+        endpoint = self._endpoint(url)
+        caching = self._cache is not None and self._cache.cacheable(endpoint)
+        if not caching and self._single_flight is None:
+            return False, self._read_json(self._send(method, url, params, **send_kwargs))
+        if caching:
+            self._ensure_version()
+            # Entries are tagged with the server versions, so that they are ignored after an upgrade.
+            version = json.dumps(
+                    self._current_versions(send_kwargs.get('timeout'), send_kwargs.get('deadline')),
+                    sort_keys=True)
+        # Keyed on the query's meaning, so renamed nodes and edges or reordered batches still hit.
+        key = make_key(url, canonicalize(params))
+        # Wildcard rankings are cached once whatever their max_results, see chp_client.ranking.
+        ranked = caching and ranking.is_ranked_request(params)
+        cache_key = make_key(url, canonicalize(ranking.without_max_results(params))) if ranked else key
+
+        def _fetch():
+            res = self._send(method, url, params, **send_kwargs)
+            ret = self._read_json(res)
+            if caching and res.status_code == 200:
+                if not ranked:
+                    self._cache.set(cache_key, endpoint, res.content, version)
+                else:
+                    # A concurrent request with a larger max_results may have cached a longer
+                    # ranking meanwhile: keep the longest.
+                    cached = self._cache.get(cache_key, version, record=False)
+                    if cached is None or not ranking.covers(cached, params["max_results"]):
+                        self._cache.set(cache_key, endpoint, ranking.pack(params["max_results"], res.content), version)
+            return res.content, ret
+
+        if caching:
+            value = self._cache.get(cache_key, version)
+            if value is not None:
+                # A ranking shorter than requested is fetched again, upgrading the cache entry.
+                ret = ranking.serve(value, params["max_results"]) if ranked else json.loads(value.decode('utf-8'))
+                # The cached response may name query graph nodes and edges after another, equivalent
+                # query, so rename them to this one's. If they do not line up, fetch afresh.
+                ret = None if ret is None else relabel_response(ret, params)
+                if ret is not None:
+                    return True, ret
+        if self._single_flight is None:
+            return False, _fetch()[1]
+        # A caller's deadline or timeout passing fails its own call only: the others try again.
+        shared, (content, ret) = self._single_flight.do(
+                key, _fetch, send_kwargs.get('deadline'), retry_on=(DeadlineExceeded, Timeout))
+        if not shared:
+            return False, ret
+        # Every caller decodes a copy of its own, named after its query graph ids.
+        ret = relabel_response(json.loads(content.decode('utf-8')), params)
+        if ret is None:
+            return False, _fetch()[1]
+        return False, ret
+
+    def _get(self, url, params=None, verbose=True, timeout=None, deadline=None, check_version=True):
         params = params or {}
-        res = requests.get(url, json=params)
-        from_cache = getattr(res, 'from_cache', False)
-        ret = res.json()
-        return from_cache, ret
-
-    def _post(self, url, params, verbose=True):
-        res = requests.post(url, json=params)
-        from_cache = getattr(res, 'from_cache', False)
-        ret = res.json()
-        return from_cache, ret
-
-    def _query_all(self, queries, **kwargs):
+        if not check_version:
+            # The handshake itself, which the cache depends on.
+            res = self._send(
+                    'GET', url, params, compress_body=False, timeout=timeout, deadline=deadline,
+                    check_version=False)
+            return False, self._read_json(res)
+        return self._cached_request('GET', url, params, compress_body=False, timeout=timeout, deadline=deadline)
+
+    def _post(self, url, params, verbose=True, stream_key=None, timeout=None, deadline=None):
+        """ Posts params as JSON and returns (from_cache, response JSON).
+
+        If stream_key is given, the response body is not read up front. Instead a generator is
+        returned that parses and yields the elements of the array under stream_key one at a time.
+        """
+        if stream_key is not None:
+            res = self._send('POST', url, params, stream=True, timeout=timeout, deadline=deadline)
+            return False, self._iter_response_items(res, stream_key)
+        return self._cached_request('POST', url, params, timeout=timeout, deadline=deadline)
+
+    def _iter_response_items(self, res, key):
+        logical_bytes = [0]
+
+        def _tally(n):
+            logical_bytes[0] += n
+
+        try:
+            chunks = iter_counted(res.iter_content(DEFAULT_READ_CHUNK_SIZE), _tally)
+            yield from iter_json_array_items(chunks, key)
+        finally:
+            self._stats.record_received(self._transport.wire_bytes(res, logical_bytes[0]), logical_bytes[0])
+            res.close()
+
+    def _coalescing_stats(self, reset=False):
+        """ Returns the number of requests sent through request coalescing, the number of callers
+        that shared another caller's request instead, and the number in flight, or None if
+        coalescing is off.
+
+        Args:
+            reset: if True, zero the counters after reading them.
+        """
+        if self._single_flight is None:
+            return None
+        stats = self._single_flight.stats()
+        if reset:
+            self._single_flight.reset_stats()
+        return stats
+
+    def _hedging_stats(self, reset=False):
+        """ Returns how often hedged requests fired and won, or None if hedging is off.
+
+        Args:
+            reset: if True, zero the counters after reading them.
+        """
+        if self._hedger is None:
+            return None
+        stats = self._hedger.stats()
+        if reset:
+            self._hedger.reset_stats()
+        return stats
+
+    def _transfer_stats(self, reset=False):
+        """ Returns the client's byte counters: the number of requests sent and the bytes sent and
+        received both on the wire (after compression) and logically (before compression).
+
+        Args:
+            reset: if True, zero the counters after reading them.
+        """
+        stats = self._stats.to_dict()
+        if reset:
+            self._stats.reset()
+        return stats
+
+    def _query_all(
+            self,
+            queries,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            max_chunk_bytes=None,
+            max_workers=None,
+            adaptive=False,
+            target_latency=DEFAULT_TARGET_LATENCY,
+            stream=False,
+            **kwargs):
         """ Return the query result.
         This is the wrapper for the POST query_all of CHP web service.
 
+        The queries are split into chunks that are posted concurrently, and the responses are
+        reassembled in input order.
+
         Args:
             queries: a list of JSON TRAPI queries.
             max_results: the maximum number of results to return. Only applicable for wildcard queries.
                 Default: 10.
+            chunk_size: the maximum number of messages per request (the initial size if adaptive).
+                Default: 100.
+            max_chunk_bytes: if given, also cap the serialized JSON size of the messages per request.
+            max_workers: the number of chunks posted concurrently. Default: the client's pool_maxsize.
+            adaptive: if True, grow or shrink chunk_size so that each request takes about
+                target_latency seconds.
+            target_latency: the per request latency in seconds the adaptive mode aims for.
+                Default: 5.
+            stream: if True, return a generator that parses the responses incrementally and yields
+                one response message at a time, in input order, as soon as it arrives.
+            timeout: the number of seconds to wait for the server per request. Default: the
+                client's timeout.
+            deadline: a budget in seconds, or a chp_client.deadline.Deadline shared with other
+                calls, for the whole call including retries. Chunks that can not be answered in time
+                are not sent. Their messages are None in the result, which is flagged with
+                "partial": True and the "missing" message indices. A streaming call instead raises
+                DeadlineExceeded once it reaches the first missing chunk.
         """
         _url = self.url + self._query_all_endpoint
-        # First pop off the message and combine them
-        q = {"message": []}
-        for query in queries:
-            q["message"].append(query.pop("message"))
+        # Reference the callers' messages rather than popping or copying them.
+        messages = [query["message"] for query in queries]
         verbose = kwargs.pop('verbose', True)
-        q["max_results"] = kwargs.pop('max_results', 10)
-        q["client_id"] = self._client_id
-        from_cache, out = self._post(_url, q, verbose=verbose)
+        max_results = kwargs.pop('max_results', 10)
+        timeout = kwargs.pop('timeout', None)
+        deadline = Deadline.coerce(kwargs.pop('deadline', None))
+        if max_workers is None:
+            max_workers = self._pool_kwargs["pool_maxsize"]
+        if adaptive:
+            sizer = AdaptiveChunkSizer(chunk_size, target_latency=target_latency)
+        else:
+            sizer = ChunkSizer(chunk_size)
+
+        def _post_chunk(chunk):
+            q = {
+                    "message": chunk,
+                    "max_results": max_results,
+                    "client_id": self._client_id,
+                    }
+            start = time.monotonic()
+            try:
+                res = self._post(
+                        _url, q, verbose=verbose, stream_key="message" if stream else None,
+                        timeout=timeout, deadline=deadline)
+            except DeadlineExceeded as ex:
+                return len(chunk), ex
+            # When streaming this only times the wait for the response headers.
+            sizer.observe(len(chunk), time.monotonic() - start)
+            return len(chunk), res
+
+        chunk_results = bounded_map(
+                _post_chunk,
+                iter_chunks(messages, sizer, max_bytes=max_chunk_bytes),
+                max_workers,
+                )
+        if stream:
+            return self._iter_chunk_messages(chunk_results)
+        out = None
+        from_cache = False
+        collected = []
+        missing = []
+        for n, result in chunk_results:
+            if isinstance(result, DeadlineExceeded):
+                missing.extend(range(len(collected), len(collected) + n))
+                collected.extend([None] * n)
+                continue
+            chunk_from_cache, chunk_out = result
+            from_cache = from_cache or chunk_from_cache
+            if out is None:
+                out = chunk_out
+            collected.extend(chunk_out["message"])
+        if out is None:
+            out = {}
+        out["message"] = collected
+        if missing:
+            out["partial"] = True
+            out["missing"] = missing
         if verbose and from_cache:
             print('Result from cache.')
         return out
 
+    @staticmethod
+    def _iter_chunk_messages(chunk_results):
+        for _, result in chunk_results:
+            if isinstance(result, DeadlineExceeded):
+                raise result
+            yield from result[1]
+
     def _query(self, q, **kwargs):
         """ Return the query result.
         This is the wrapper for the POST query of CHP web service.
@@ -82,22 +751,68 @@ class ChpClient:
         Args:
             q: a JSON TRAPI query.
             max_results: the maximum number of results to return. Only applicable for wildcard queries.
-                Default: 10.
+                Default: 10. With a response cache, a wildcard query is cached once and smaller
+                max_results are answered by slicing the longest ranking fetched so far.
+            timeout: the number of seconds to wait for the server per request. Default: the
+                client's timeout.
+            deadline: a budget in seconds, or a chp_client.deadline.Deadline shared with other
+                calls, for the query including its retries. Raises DeadlineExceeded once it passes.
         """
         _url = self.url + self._query_endpoint
         verbose = kwargs.pop('verbose', True)
-        q["max_results"] = kwargs.pop('max_results', 10)
-        q["client_id"] = self._client_id
-        from_cache, out = self._post(_url, q, verbose=verbose)
+        timeout = kwargs.pop('timeout', None)
+        deadline = Deadline.coerce(kwargs.pop('deadline', None))
+        # Shallow wrap so the caller's query is left untouched and its message is not copied.
+        payload = dict(q)
+        payload["max_results"] = kwargs.pop('max_results', 10)
+        payload["client_id"] = self._client_id
+        from_cache, out = self._post(_url, payload, verbose=verbose, timeout=timeout, deadline=deadline)
         if verbose and from_cache:
             print('Result from cache.')
         return out
 
+    def _query_many(self, queries, max_workers=None, ordered=True, max_in_flight=None, **kwargs):
+        """ Runs many queries over a thread pool sharing the client's connection pool.
+        This returns a generator, so use list(client.query_many(queries)) to collect every result.
+
+        Args:
+            queries: an iterable of JSON TRAPI queries. It is consumed lazily.
+            max_workers: the number of concurrent requests. Default: the client's pool_maxsize,
+                so that every worker can keep its connection alive.
+            ordered: if True, yield results in input order. If False, yield (index, result) pairs
+                as each query completes.
+            max_in_flight: the maximum number of queries submitted but not yet yielded, which bounds
+                memory on very large sweeps. Default: 2 * max_workers.
+            deadline: a budget in seconds, or a chp_client.deadline.Deadline, shared by every query.
+                A query that can not be answered in time is not sent, and its result is the
+                DeadlineExceeded exception instead of raising it.
+
+        All other kwargs (e.g. timeout) are passed to query.
+        """
+        if max_workers is None:
+            max_workers = self._pool_kwargs["pool_maxsize"]
+        # One Deadline object, so that every query counts down the same budget.
+        kwargs["deadline"] = Deadline.coerce(kwargs.get('deadline'))
+
+        def _query_one(q):
+            try:
+                return ChpClient._query(self, q, **kwargs)
+            except DeadlineExceeded as ex:
+                return ex
+
+        return bounded_map(
+                _query_one,
+                queries,
+                max_workers,
+                ordered=ordered,
+                max_in_flight=max_in_flight,
+                )
+
     def _predicates(self, verbose=True, **kwargs):
         """ Returns a dictionary of available query edge predicates that are currently supported.
         """
         _url = self.url + self._predicates_endpoint
-        from_cache, ret = self._get(_url, verbose=verbose)
+        from_cache, ret = self._get(_url, verbose=verbose, timeout=kwargs.get('timeout'))
         if verbose and from_cache:
             print('Result from cache.')
         return ret
@@ -106,7 +821,7 @@ class ChpClient:
         """ Returns a dictionary of TRAPI constants to be used in query building.
         """
         _url = self.url + self._constants_endpoint
-        from_cache, ret = self._get(_url, verbose=verbose)
+        from_cache, ret = self._get(_url, verbose=verbose, timeout=kwargs.get('timeout'))
         if verbose and from_cache:
             print('Result from cache.')
         return ret
@@ -138,20 +853,50 @@ class ChpClient:
                  ],
             ...
             }
+
+        The catalog property keeps an indexed copy on disk, for repeated lookups.
         """
         _url = self.url + self._curies_endpoint
         # Send reasoner_id in get payload
         payload = {"client_id": self._client_id}
-        from_cache, ret = self._get(_url, params=payload, verbose=verbose)
+        from_cache, ret = self._get(_url, params=payload, verbose=verbose, timeout=kwargs.get('timeout'))
         if verbose and from_cache:
             print('Result from cache.')
         return ret
 
+    @property
+    def catalog(self):
+        """ The endpoint's curies as a chp_client.catalog.CurieCatalog, indexed by curie, name and
+        category, and kept on disk until the endpoint's versions change.
+
+        Example:
+            client.catalog.lookup(name='RAF1')
+        """
+        if self._catalog is None:
+            self._catalog = CurieCatalog(self)
+        return self._catalog
+
+    def _resolve_names(self, names, category=None, min_score=DEFAULT_MIN_SCORE):
+        """ Returns the curie best matching each of names (e.g. gene or drug names typed by a user),
+        or None where nothing in the catalog matches well enough. Fuzzy matching tolerates case,
+        spacing and small spelling differences.
+
+        Args:
+            names: a list of names.
+            category: only match curies of this category, e.g. 'biolink:Gene'.
+            min_score: the lowest trigram similarity, between 0 and 1, accepted as a match.
+
+        Example:
+            genes = client.resolve_names(['raf1', 'map3k13'], category='biolink:Gene')
+            q = build_standard_query(genes=genes, ...)
+        """
+        return self.catalog.resolve_names(names, category=category, min_score=min_score)
+
     def _versions(self, verbose=True, **kwargs):
         """ Returns a dictionary of all enpoint dependency versions
         """
         _url = self.url + self._versions_endpoint
-        from_cache, ret = self._get(_url, verbose=verbose)
+        from_cache, ret = self._get(_url, verbose=verbose, timeout=kwargs.get('timeout'))
         if verbose and from_cache:
             print('Result from cache.')
         return ret
@@ -234,36 +979,73 @@ class ChpClient:
         return ranks
 
     def _set_caching(self, cache_db=None, verbose=True, **kwargs):
-        '''Installs a local cache for all requests.
-            **cache_db** is the path to the local sqlite cache database.'''
-        if caching_avail:
-            if cache_db is None:
-                cache_db = self._default_cache_file
-            requests_cache.install_cache(
-                cache_name=cache_db, allowable_methods=(
-                    'GET', 'POST'), **kwargs)
-            self._cached = True
-            if verbose:
-                print(
-                    '[ Future queries will be cached in "{0}" ]'.format(
-                        os.path.abspath(
-                            cache_db + '.sqlite')))
-        else:
-            print("Error: The requests_cache python module is required to use request caching.")
-            print("See - https://requests-cache.readthedocs.io/en/latest/user_guide.html#installation")
+        '''Installs a local response cache for this client, kept in memory and in a sqlite file.
+            **cache_db** is the path to the local sqlite cache database, without its .sqlite suffix.
+            Default: chp_cache under $CHP_CLIENT_CACHE_DIR (or ~/.cache/chp_client).
+            Other kwargs (ttls, size and count bounds) are passed to chp_client.cache.TieredCache.'''
+        if cache_db is None:
+            cache_db = os.path.join(cache_dir(), DEFAULT_CACHE_NAME)
+        self._stop_caching()
+        self._cache = TieredCache(path=cache_db + '.sqlite', **kwargs)
+        self._owns_cache = True
+        self._cache_config = dict(kwargs, cache_db=cache_db)
+        if verbose:
+            print(
+                '[ Future queries will be cached in "{0}" ]'.format(
+                    os.path.abspath(
+                        cache_db + '.sqlite')))
         return
 
     def _stop_caching(self):
         '''Stop caching.'''
-        if self._cached and caching_avail:
-            requests_cache.uninstall_cache()
-            self._cached = False
+        if self._owns_cache:
+            self._cache.close()
+        self._cache = None
+        self._owns_cache = False
+        self._cache_config = None
         return
 
     def _clear_cache(self):
-        ''' Clear the globally installed cache. '''
-        try:
-            requests_cache.clear()
-        except AttributeError:
-            # requests_cache is not enabled
-            print("requests_cache is not enabled. Nothing to clear.")
+        ''' Clear the client's response cache. '''
+        if self._cache is None:
+            print("Caching is not enabled. Nothing to clear.")
+            return
+        self._cache.invalidate()
+
+    def _invalidate(self, endpoint=None):
+        """ Drops the cached responses of endpoint (e.g. '/curies/'), or every cached response if
+        endpoint is None.
+        """
+        if self._cache is not None:
+            self._cache.invalidate(endpoint)
+
+    def _cache_stats(self, reset=False):
+        """ Returns the response cache's hit, miss and eviction counters and the size of each tier,
+        or None if caching is off.
+
+        Args:
+            reset: if True, zero the counters after reading them.
+        """
+        if self._cache is None:
+            return None
+        stats = self._cache.stats()
+        if reset:
+            self._cache.reset_stats()
+        return stats
+
+
+def _rebuild_client(cls, settings, state):
+    """ Rebuilds a client pickled by ChpClient.__reduce__.
+    """
+    settings = dict(settings)
+    if state["handshake"] is not None:
+        # The endpoint was already checked, so skip the round trip.
+        settings["version_check"] = OFF
+    client = cls(**settings)
+    # The copy's Hedger was unpickled for it alone.
+    client._owns_hedger = client._hedger is not None
+    if state["handshake"] is not None:
+        client._handshake = state["handshake"]
+    if state["cache_config"] is not None:
+        client._set_caching(verbose=False, **state["cache_config"])
+    return client
@@ -0,0 +1,117 @@
+"""
+Request body compression and wire byte accounting.
+"""
+
+import threading
+import zlib
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import zstandard
+    zstd_avail = True
+except ImportError:
+    zstd_avail = False
+
+# Compression level used when none is given.
+DEFAULT_LEVELS = {
+        "gzip": 6,
+        "zstd": 3,
+        }
+
+
+def check_algorithm(algorithm):
+    """ Raises a ValueError if algorithm can not be used to compress request bodies.
+    """
+    if algorithm not in DEFAULT_LEVELS:
+        raise ValueError('Unknown compression algorithm {}, choose one of {}.'.format(
+            algorithm, list(DEFAULT_LEVELS)))
+    if algorithm == 'zstd' and not zstd_avail:
+        raise ValueError('The zstandard python module is required to use zstd compression.')
+
+
+def accept_encoding():
+    """ Returns the Accept-Encoding header value listing every encoding the transport can decode
+    (gzip and deflate, plus br and zstd when their decoders are installed).
+    """
+    return ACCEPT_ENCODING
+
+
+def _compressobj(algorithm, level):
+    if level is None:
+        level = DEFAULT_LEVELS[algorithm]
+    if algorithm == 'gzip':
+        # wbits=31 writes a gzip header and trailer around the deflate stream.
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def compress(data, algorithm, level=None):
+    """ Returns data compressed with algorithm ('gzip' or 'zstd').
+    """
+    if algorithm == 'zstd':
+        # The one shot API records the content size in the frame header.
+        return zstandard.ZstdCompressor(level=level or DEFAULT_LEVELS['zstd']).compress(data)
+    compressor = _compressobj(algorithm, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compress(chunks, algorithm, level=None):
+    """ Compresses an iterable of byte strings incrementally, yielding compressed pieces.
+    """
+    compressor = _compressobj(algorithm, level)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def iter_counted(chunks, tally):
+    """ Passes an iterable of byte strings through unchanged, calling tally with each one's length.
+    """
+    for chunk in chunks:
+        tally(len(chunk))
+        yield chunk
+
+
+class TransferStats:
+    """ Thread safe counters of bytes sent and received, both as they went over the wire and as
+    they were before compression (logical).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.sent_wire_bytes = 0
+            self.sent_logical_bytes = 0
+            self.received_wire_bytes = 0
+            self.received_logical_bytes = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_sent(self, wire_bytes, logical_bytes):
+        with self._lock:
+            self.sent_wire_bytes += wire_bytes
+            self.sent_logical_bytes += logical_bytes
+
+    def record_received(self, wire_bytes, logical_bytes):
+        with self._lock:
+            self.received_wire_bytes += wire_bytes
+            self.received_logical_bytes += logical_bytes
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                    "requests": self.requests,
+                    "sent_wire_bytes": self.sent_wire_bytes,
+                    "sent_logical_bytes": self.sent_logical_bytes,
+                    "received_wire_bytes": self.received_wire_bytes,
+                    "received_logical_bytes": self.received_logical_bytes,
+                    }
@@ -0,0 +1,61 @@
+"""
+Thread pool helpers used by the batch endpoint wrappers.
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def bounded_map(func, iterable, max_workers, ordered=True, max_in_flight=None):
+    """ Applies func to every item of iterable on a thread pool and yields the results.
+
+    The iterable is consumed lazily and no more than max_in_flight items are submitted but not yet
+    yielded at any time, so memory stays bounded however long the input is.
+
+    Args:
+        func: a callable taking one item.
+        iterable: the items to process.
+        max_workers: the number of worker threads.
+        ordered: if True, yield results in input order. If False, yield (index, result) pairs as
+            soon as each item completes.
+        max_in_flight: the maximum number of submitted but unyielded items. Default: 2 * max_workers.
+    """
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1.')
+    if max_in_flight is None:
+        max_in_flight = 2 * max_workers
+    if max_in_flight < 1:
+        raise ValueError('max_in_flight must be at least 1.')
+    items = enumerate(iterable)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chp_client')
+    in_flight = collections.deque() if ordered else {}
+
+    def _submit_next():
+        for i, item in items:
+            future = executor.submit(func, item)
+            if ordered:
+                in_flight.append(future)
+            else:
+                in_flight[future] = i
+            return True
+        return False
+
+    try:
+        while len(in_flight) < max_in_flight and _submit_next():
+            pass
+        while in_flight:
+            if ordered:
+                result = in_flight.popleft().result()
+                _submit_next()
+                yield result
+            else:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = in_flight.pop(future)
+                    _submit_next()
+                    yield i, future.result()
+    finally:
+        # Drop work that has not started if the caller stops early or a query failed.
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
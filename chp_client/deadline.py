@@ -0,0 +1,49 @@
+"""
+Deadline budgets shared by every request of a call, its retries and its chunks.
+"""
+
+import time
+
+
+class Deadline:
+    """ A point in time after which no more work should be started.
+
+    Pass the same Deadline to several calls (e.g. every query of a sweep step) to share one budget
+    between them.
+
+    Args:
+        seconds: the budget, in seconds from now.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def coerce(cls, deadline):
+        """ Returns deadline as a Deadline, taking None, a number of seconds or a Deadline.
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        """ Returns the number of seconds left, never less than 0.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, timeout=None):
+        """ Returns the timeout of the next request: timeout capped by the time left.
+        """
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+def request_timeout(timeout, deadline):
+    """ Returns the timeout of the next request given a per call timeout and an optional Deadline.
+    """
+    return timeout if deadline is None else deadline.timeout(timeout)
@@ -0,0 +1,29 @@
+"""
+Request body encoding helpers.
+"""
+
+import json
+
+# Size (bytes) of the pieces a streamed JSON body is sent in.
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+
+_encoder = json.JSONEncoder()
+
+
+def iter_json_bytes(obj, chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+    """ Yields the JSON serialization of obj as utf-8 byte strings of about chunk_size bytes.
+
+    The body is encoded incrementally from obj itself, so a large payload never exists as a
+    single string. Passing the generator as a requests body sends it with chunked transfer-encoding.
+    """
+    pieces = []
+    size = 0
+    for piece in _encoder.iterencode(obj):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(pieces).encode('utf-8')
+            pieces = []
+            size = 0
+    if pieces:
+        yield ''.join(pieces).encode('utf-8')
@@ -44,3 +44,45 @@ class QueryBuildError(Exception):
     def __str__(self):
         return self.message
 
+
+class CircuitOpenError(Exception):
+    def __init__(self, endpoint, retry_in, message='Circuit open, endpoint is failing'):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return '{}: {} (next trial in {:.1f}s)'.format(self.message, self.endpoint, self.retry_in)
+
+class ChpResponseError(Exception):
+    def __init__(self, url, status_code, body, message='Bad response from CHP endpoint'):
+        self.url = url
+        self.status_code = status_code
+        self.body = body
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return '{}: {} returned status {}: {!r}'.format(self.message, self.url, self.status_code, self.body[:200])
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline, message='Deadline exceeded'):
+        self.deadline = deadline
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return '{} ({:.1f}s budget)'.format(self.message, self.deadline.seconds)
+
+class VersionMismatchError(Exception):
+    def __init__(self, local_version, endpoint_version, url=None, message='Version deviation in chp_client'):
+        self.local_version = local_version
+        self.endpoint_version = endpoint_version
+        self.url = url
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return '{}: local {}, endpoint {} expects {}. Please update chp_client to grab the newest version'.format(
+                self.message, self.local_version, self.url or 'the endpoint', self.endpoint_version)
@@ -0,0 +1,219 @@
+"""
+Semantic fingerprints of TRAPI queries.
+
+Query builders name query graph nodes and edges automatically, so two queries asking the same
+thing may serialize differently. canonicalize rewrites a request payload into a form that does
+not depend on node and edge ids, dictionary order, or the order of batch lists (ids, categories,
+predicates and constraints), and fingerprint hashes that form.
+
+Nodes are told apart by colour refinement (1-dimensional Weisfeiler-Lehman) over their content and
+their edges, which identifies every tree shaped query graph, and so every graph CHP answers, up to
+isomorphism. relabel_response maps a response to one query back onto the ids of an equivalent one.
+"""
+
+import hashlib
+import json
+
+# Lists whose order carries no meaning.
+UNORDERED_LISTS = ('ids', 'categories', 'predicates', 'constraints')
+
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+def _digest(obj):
+    return hashlib.sha256(_dumps(obj).encode('utf-8')).hexdigest()
+
+
+def _normalize(obj, key=None):
+    if isinstance(obj, dict):
+        return {k: _normalize(v, k) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        items = [_normalize(item) for item in obj]
+        if key in UNORDERED_LISTS:
+            items.sort(key=_dumps)
+        return items
+    return obj
+
+
+def _refine(query_graph):
+    """ Returns (node contents, edge contents, node labels, edge labels) of query_graph, where the
+    labels do not depend on node or edge ids.
+    """
+    nodes = query_graph.get("nodes") or {}
+    edges = query_graph.get("edges") or {}
+    node_content = {node_id: _normalize(node) for node_id, node in nodes.items()}
+    edge_content = {
+            edge_id: _normalize({k: v for k, v in edge.items() if k not in ('subject', 'object')})
+            for edge_id, edge in edges.items()
+            }
+    edge_digests = {edge_id: _digest(content) for edge_id, content in edge_content.items()}
+    labels = {node_id: _digest(content) for node_id, content in node_content.items()}
+
+    def _label(node_id):
+        # An edge to a missing node keeps the raw id, which is all there is to go by.
+        return labels.get(node_id, node_id)
+
+    # Refine node labels with their neighbourhoods until the partition of nodes stops changing.
+    for _ in range(len(nodes)):
+        neighbourhoods = {node_id: [] for node_id in nodes}
+        for edge_id, edge in edges.items():
+            subject, object_ = edge.get("subject"), edge.get("object")
+            if subject in neighbourhoods:
+                neighbourhoods[subject].append(['out', edge_digests[edge_id], _label(object_)])
+            if object_ in neighbourhoods:
+                neighbourhoods[object_].append(['in', edge_digests[edge_id], _label(subject)])
+        refined = {
+                node_id: _digest([labels[node_id], sorted(neighbourhoods[node_id])])
+                for node_id in nodes
+                }
+        stable = len(set(refined.values())) == len(set(labels.values()))
+        labels = refined
+        if stable:
+            break
+
+    edge_labels = {
+            edge_id: _digest([_label(edge.get("subject")), _label(edge.get("object")), edge_digests[edge_id]])
+            for edge_id, edge in edges.items()
+            }
+    return node_content, edge_content, labels, edge_labels
+
+
+def canonicalize_query_graph(query_graph):
+    """ Returns a JSON serializable form of query_graph that is the same for every renaming of its
+    nodes and edges.
+    """
+    node_content, edge_content, labels, _ = _refine(query_graph)
+    edges = query_graph.get("edges") or {}
+    canonical = {k: _normalize(v, k) for k, v in query_graph.items() if k not in ('nodes', 'edges')}
+    canonical["nodes"] = sorted(([labels[node_id], content] for node_id, content in node_content.items()), key=_dumps)
+    canonical["edges"] = sorted(
+            ([labels.get(edge.get("subject"), edge.get("subject")),
+              labels.get(edge.get("object"), edge.get("object")),
+              edge_content[edge_id]]
+                for edge_id, edge in edges.items()),
+            key=_dumps)
+    return canonical
+
+
+def _match(from_labels, to_labels):
+    """ Returns a {from id: to id} pairing of ids with equal labels, or None if the labels differ.
+    """
+    def _groups(labels):
+        groups = {}
+        for item_id, label in sorted(labels.items()):
+            groups.setdefault(label, []).append(item_id)
+        return groups
+
+    from_groups, to_groups = _groups(from_labels), _groups(to_labels)
+    if {k: len(v) for k, v in from_groups.items()} != {k: len(v) for k, v in to_groups.items()}:
+        return None
+    # Ids sharing a label are interchangeable, so any pairing of them will do.
+    return {f: t for label, ids in from_groups.items() for f, t in zip(ids, to_groups[label])}
+
+
+def relabel_message(response_message, request_message):
+    """ Renames the query graph nodes and edges of a response message (and their bindings in the
+    results) to the ids used by an equivalent request message, e.g. when a response cached for one
+    query answers another one with the same fingerprint.
+
+    Returns the renamed message, or None if the two query graphs do not line up.
+    """
+    try:
+        response_qg = response_message["query_graph"]
+        request_qg = request_message["query_graph"]
+    except (KeyError, TypeError):
+        return response_message
+    if not response_qg or not request_qg:
+        return response_message
+    _, _, response_nodes, response_edges = _refine(response_qg)
+    _, _, request_nodes, request_edges = _refine(request_qg)
+    node_map = _match(response_nodes, request_nodes)
+    edge_map = _match(response_edges, request_edges)
+    if node_map is None or edge_map is None:
+        return None
+    if all(k == v for k, v in node_map.items()) and all(k == v for k, v in edge_map.items()):
+        return response_message
+    message = dict(response_message)
+    edges = {}
+    for edge_id, edge in (response_qg.get("edges") or {}).items():
+        edge = dict(edge)
+        edge["subject"] = node_map.get(edge.get("subject"), edge.get("subject"))
+        edge["object"] = node_map.get(edge.get("object"), edge.get("object"))
+        edges[edge_map[edge_id]] = edge
+    message["query_graph"] = dict(
+            response_qg,
+            nodes={node_map[node_id]: node for node_id, node in (response_qg.get("nodes") or {}).items()},
+            edges=edges,
+            )
+    if message.get("results"):
+        results = []
+        for result in message["results"]:
+            result = dict(result)
+            if "node_bindings" in result:
+                result["node_bindings"] = {node_map.get(k, k): v for k, v in result["node_bindings"].items()}
+            if "edge_bindings" in result:
+                result["edge_bindings"] = {edge_map.get(k, k): v for k, v in result["edge_bindings"].items()}
+            results.append(result)
+        message["results"] = results
+    return message
+
+
+def relabel_response(response, request):
+    """ Applies relabel_message to the message (or each batch message) of a response to request.
+    Returns None if any message does not line up.
+    """
+    if hasattr(request, 'to_dict'):
+        request = request.to_dict()
+    if not isinstance(response, dict) or not isinstance(request, dict) or "message" not in request:
+        return response
+    response_message, request_message = response.get("message"), request["message"]
+    if isinstance(request_message, list):
+        if not isinstance(response_message, list) or len(response_message) != len(request_message):
+            return None
+        messages = [relabel_message(a, b) for a, b in zip(response_message, request_message)]
+        if any(m is None for m in messages):
+            return None
+    else:
+        messages = relabel_message(response_message, request_message)
+        if messages is None:
+            return None
+    return dict(response, message=messages)
+
+
+def canonicalize_message(message):
+    """ Returns a JSON serializable canonical form of a TRAPI message.
+    """
+    if not isinstance(message, dict):
+        return _normalize(message)
+    canonical = {k: _normalize(v, k) for k, v in message.items() if k != 'query_graph'}
+    if message.get("query_graph"):
+        canonical["query_graph"] = canonicalize_query_graph(message["query_graph"])
+    return canonical
+
+
+def canonicalize(payload):
+    """ Returns a JSON serializable canonical form of a request payload. The message of a query,
+    or each message of a batch (whose order is kept, since results come back in that order), is
+    canonicalized. Other payloads are returned as is.
+    """
+    if hasattr(payload, 'to_dict'):
+        # E.g. a trapi_model Query.
+        payload = payload.to_dict()
+    if not isinstance(payload, dict) or "message" not in payload:
+        return payload
+    canonical = dict(payload)
+    message = payload["message"]
+    if isinstance(message, list):
+        canonical["message"] = [canonicalize_message(m) for m in message]
+    else:
+        canonical["message"] = canonicalize_message(message)
+    return canonical
+
+
+def fingerprint(payload):
+    """ Returns a hex digest identifying payload up to renaming of query graph nodes and edges,
+    dictionary order and batch list order.
+    """
+    return _digest(canonicalize(payload))
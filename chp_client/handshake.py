@@ -0,0 +1,81 @@
+"""
+Version handshake between chp_client and a CHP endpoint, cached per url in memory and on disk.
+"""
+
+import hashlib
+import threading
+import time
+import warnings
+
+from chp_client._version import __version__
+from chp_client.exceptions import VersionMismatchError
+from chp_client.snapshot import read_snapshot, write_snapshot
+
+# Seconds a successful handshake with an endpoint is reused before it is checked again.
+DEFAULT_HANDSHAKE_TTL = 60 * 60
+# Seconds between reads of an endpoint's versions for noticing server upgrades, which invalidate
+# cached responses.
+DEFAULT_VERSION_TTL = 60
+
+# When ChpClient checks the endpoint version.
+EAGER = 'eager'
+LAZY = 'lazy'
+BACKGROUND = 'background'
+OFF = 'off'
+VERSION_CHECK_MODES = (EAGER, LAZY, BACKGROUND, OFF)
+
+# url -> (time.time() of the check, endpoint versions)
+_handshakes = {}
+_lock = threading.Lock()
+
+
+def _snapshot_name(url):
+    return 'versions-{}'.format(hashlib.sha1(url.encode('utf-8')).hexdigest()[:16])
+
+
+def cached_versions(url, ttl=DEFAULT_HANDSHAKE_TTL):
+    """ Returns the versions endpoint answer recorded for url less than ttl seconds ago, from this
+    process or from the on-disk snapshot, or None.
+    """
+    with _lock:
+        entry = _handshakes.get(url)
+    if entry is not None and time.time() - entry[0] <= ttl:
+        return entry[1]
+    versions, age = read_snapshot(_snapshot_name(url))
+    if versions is None or age > ttl:
+        return None
+    with _lock:
+        _handshakes[url] = (time.time() - age, versions)
+    return versions
+
+
+def save_versions(url, versions):
+    """ Records the versions endpoint answer of url in memory and on disk.
+    """
+    with _lock:
+        _handshakes[url] = (time.time(), versions)
+    write_snapshot(_snapshot_name(url), versions)
+
+
+def clear_cache():
+    """ Forgets every handshake recorded in this process. On-disk snapshots are left alone.
+    """
+    with _lock:
+        _handshakes.clear()
+
+
+def check_versions(package_versions, url=None):
+    """ Checks the local chp_client version against the one an endpoint expects.
+
+    Raises:
+        VersionMismatchError: if the major or minor versions differ. A patch difference only warns.
+    """
+    endpoint_version = package_versions['chp_client']
+    endpoint_version_split = [int(x) for x in endpoint_version.split('.')]
+    local_version_split = [int(x) for x in __version__.split('.')]
+    if endpoint_version_split[0] != local_version_split[0]:
+        raise VersionMismatchError(__version__, endpoint_version, url, message='Major version deviation in chp_client')
+    elif endpoint_version_split[1] != local_version_split[1]:
+        raise VersionMismatchError(__version__, endpoint_version, url, message='Minor version deviation in chp_client')
+    elif endpoint_version_split[2] != local_version_split[2]:
+        warnings.warn('Patch version deviation in chp_client. Please update chp_client to grab the newest version or run at your own risk!')
@@ -0,0 +1,174 @@
+"""
+Hedged requests: send a duplicate when the first answer is slower than usual.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """ Thread safe window of the most recent request latencies.
+
+    Args:
+        window: the number of latencies kept.
+    """
+
+    def __init__(self, window=200):
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, p):
+        """ Returns the p-th (0-100) percentile of the recorded latencies, or None if there are none.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+
+class Hedger:
+    """ Runs requests so that a duplicate is sent when the first one is slow.
+
+    If a request has not answered within the percentile-th percentile of recent latencies, the same
+    request is sent again and whichever answers first is used. The loser is cancelled if it has not
+    started yet, otherwise its response is closed as soon as it arrives.
+
+    Until enough latencies are known the request runs on the caller's thread. Afterwards it runs on
+    a thread of its own, so that the caller can stop waiting for it, and only hedges share the pool
+    of max_workers threads. Latencies are timed from when a request is actually sent.
+
+    Args:
+        percentile: the latency percentile (0-100) after which a hedge is sent.
+        min_delay: the shortest wait in seconds before hedging, so that fast endpoints are not
+            flooded with duplicates.
+        min_samples: the number of latencies to observe before any hedging starts.
+        window: the number of recent latencies the percentile is computed over.
+        max_workers: the number of threads used to run hedges. Requests themselves are not limited.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.05, min_samples=20, window=200, max_workers=20):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.max_workers = max_workers
+        self.latencies = LatencyTracker(window)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chp_client_hedge')
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __getstate__(self):
+        # A copy in another process starts with its own threads and no latency history.
+        return {
+                "percentile": self.percentile,
+                "min_delay": self.min_delay,
+                "min_samples": self.min_samples,
+                "window": self.window,
+                "max_workers": self.max_workers,
+                }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.hedges_fired = 0
+            self.hedges_won = 0
+
+    def stats(self):
+        """ Returns how many requests ran, how many needed a hedge, and how many hedges answered first.
+        """
+        with self._lock:
+            return {
+                    "requests": self.requests,
+                    "hedges_fired": self.hedges_fired,
+                    "hedges_won": self.hedges_won,
+                    "hedge_delay": self.hedge_delay(),
+                    }
+
+    def hedge_delay(self):
+        """ Returns the current wait before hedging, or None while too few latencies are known.
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def _timed(self, send):
+        start = time.monotonic()
+        res = send()
+        self.latencies.record(time.monotonic() - start)
+        return res
+
+    def _spawn(self, send):
+        """ Runs send on a new thread and returns its future.
+        """
+        future = Future()
+
+        def _run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._timed(send))
+            except BaseException as ex:
+                future.set_exception(ex)
+
+        threading.Thread(target=_run, name='chp_client_request', daemon=True).start()
+        return future
+
+    def run(self, send):
+        """ Calls send (a function taking no arguments that performs the request and returns the
+        response), hedging it if it is slow, and returns the first response.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay()
+        if delay is None:
+            # No hedge can fire yet.
+            return self._timed(send)
+        primary = self._spawn(send)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            self.hedges_fired += 1
+        hedge = self._executor.submit(self._timed, send)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in (done | pending) - {future}:
+                    _cancel(loser)
+                if future is hedge:
+                    with self._lock:
+                        self.hedges_won += 1
+                return future.result()
+        raise error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _cancel(future):
+    if not future.cancel():
+        future.add_done_callback(_close_response)
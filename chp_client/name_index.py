@@ -0,0 +1,116 @@
+"""
+Fuzzy name to curie resolution over a curie catalog.
+"""
+
+import bisect
+import collections
+
+# Length of the character n-grams names are indexed by.
+GRAM_SIZE = 3
+# Default similarity below which fuzzy matches are dropped.
+DEFAULT_MIN_SCORE = 0.5
+
+
+def normalize_name(name):
+    return ' '.join(name.split()).casefold()
+
+
+def _grams(text):
+    # Padding the start makes leading characters count more than the rest.
+    padded = ' ' * (GRAM_SIZE - 1) + text + ' '
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+class NameIndex:
+    """ Trigram and prefix index over the names of catalog entries (dictionaries of curie, name and
+    categories, see chp_client.catalog.CurieCatalog).
+
+    Fuzzy matches are ranked by the Dice similarity of the names' character trigrams, 1.0 being an
+    exact match up to case and whitespace. Prefix completion binary searches the sorted names.
+
+    Args:
+        entries: the catalog entries to index. Entries without a name are skipped.
+    """
+
+    def __init__(self, entries):
+        self._entries = [entry for entry in entries if entry.get("name")]
+        self._names = [normalize_name(entry["name"]) for entry in self._entries]
+        self._exact = collections.defaultdict(list)
+        self._postings = collections.defaultdict(list)
+        self._gram_counts = []
+        for i, name in enumerate(self._names):
+            self._exact[name].append(i)
+            grams = _grams(name)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(i)
+        self._sorted = sorted((name, i) for i, name in enumerate(self._names))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _match(self, i, score):
+        entry = self._entries[i]
+        return dict(entry, categories=list(entry["categories"]), score=score)
+
+    def _in_category(self, i, category):
+        return category is None or category in self._entries[i]["categories"]
+
+    def _ranked(self, i):
+        return len(self._names[i]), self._names[i]
+
+    def search(self, name, category=None, limit=10, min_score=DEFAULT_MIN_SCORE):
+        """ Returns up to limit entries whose names resemble name, best first, each with its
+        similarity under "score".
+
+        Args:
+            name: the name to look for, e.g. 'raf-1'.
+            category: only return entries of this category, e.g. 'biolink:Gene'.
+            limit: the maximum number of matches, or None for all of them.
+            min_score: the lowest similarity, between 0 and 1, to return.
+        """
+        query = normalize_name(name)
+        exact = [i for i in self._exact.get(query, []) if self._in_category(i, category)]
+        if limit is not None and len(exact) >= limit:
+            return [self._match(i, 1.0) for i in sorted(exact, key=self._ranked)[:limit]]
+        grams = _grams(query)
+        common = collections.Counter()
+        for gram in grams:
+            common.update(self._postings.get(gram, ()))
+        scored = []
+        for i, count in common.items():
+            score = 1.0 if self._names[i] == query else 2.0 * count / (len(grams) + self._gram_counts[i])
+            if score >= min_score and self._in_category(i, category):
+                scored.append((-score, self._ranked(i), i))
+        scored.sort()
+        if limit is not None:
+            scored = scored[:limit]
+        return [self._match(i, -neg_score) for neg_score, _, i in scored]
+
+    def complete(self, prefix, category=None, limit=10):
+        """ Returns up to limit entries whose names start with prefix, shortest names first.
+        """
+        prefix = normalize_name(prefix)
+        start = bisect.bisect_left(self._sorted, (prefix, -1))
+        found = []
+        for name, i in self._sorted[start:]:
+            if not name.startswith(prefix):
+                break
+            if self._in_category(i, category):
+                found.append(i)
+        found.sort(key=self._ranked)
+        if limit is not None:
+            found = found[:limit]
+        return [self._match(i, 1.0 if self._names[i] == prefix else len(prefix) / len(self._names[i])) for i in found]
+
+    def resolve_names(self, names, category=None, min_score=DEFAULT_MIN_SCORE):
+        """ Returns the curie of the best match of each name, or None where nothing scores at least
+        min_score. Each distinct name is only resolved once.
+        """
+        resolved = {}
+        for name in names:
+            key = normalize_name(name)
+            if key not in resolved:
+                best = self.search(key, category=category, limit=1, min_score=min_score)
+                resolved[key] = best[0]["curie"] if best else None
+        return [resolved[normalize_name(name)] for name in names]
@@ -1,26 +1,49 @@
 """
 Helper module for loading and building CHP queries.
+
+trapi_model (and the biolink model it loads) is only imported when a query is first built, so that
+importing this module stays cheap.
 """
 
 import json
-from jsonschema import ValidationError
-
-from trapi_model.query import Query
-from trapi_model.message import Message
-from trapi_model.biolink.constants import *
 
 from chp_client.exceptions import *
 
-SUBJECT_TO_OBJECT_PREDICATE_MAP = {
-        BIOLINK_GENE: {
-            BIOLINK_DRUG: BIOLINK_INTERACTS_WITH,
-            BIOLINK_DISEASE: BIOLINK_GENE_ASSOCIATED_WITH_CONDITION,
-            },
-        BIOLINK_DRUG: {
-            BIOLINK_GENE: BIOLINK_INTERACTS_WITH,
-            BIOLINK_DISEASE: BIOLINK_TREATS,
-            }
-        }
+_subject_to_object_predicate_map = None
+
+
+def get_subject_to_object_predicate_map():
+    """ Returns the one hop edge predicate to use for each supported (subject, object) category pair.
+    """
+    global _subject_to_object_predicate_map
+    if _subject_to_object_predicate_map is None:
+        # Import statement
+        from trapi_model.biolink.constants import (
+                BIOLINK_GENE,
+                BIOLINK_DRUG,
+                BIOLINK_DISEASE,
+                BIOLINK_INTERACTS_WITH,
+                BIOLINK_GENE_ASSOCIATED_WITH_CONDITION,
+                BIOLINK_TREATS,
+                )
+        _subject_to_object_predicate_map = {
+                BIOLINK_GENE: {
+                    BIOLINK_DRUG: BIOLINK_INTERACTS_WITH,
+                    BIOLINK_DISEASE: BIOLINK_GENE_ASSOCIATED_WITH_CONDITION,
+                    },
+                BIOLINK_DRUG: {
+                    BIOLINK_GENE: BIOLINK_INTERACTS_WITH,
+                    BIOLINK_DISEASE: BIOLINK_TREATS,
+                    }
+                }
+    return _subject_to_object_predicate_map
+
+
+def __getattr__(name):
+    if name == 'SUBJECT_TO_OBJECT_PREDICATE_MAP':
+        return get_subject_to_object_predicate_map()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
 
 def build_standard_query(
         genes=None,
@@ -36,6 +59,18 @@ def build_standard_query(
         batch_drugs=None,
         batch_diseases=None,
         ):
+    # Import statement
+    from trapi_model.query import Query
+    from trapi_model.message import Message
+    from trapi_model.biolink.constants import (
+            BIOLINK_GENE,
+            BIOLINK_DRUG,
+            BIOLINK_DISEASE,
+            BIOLINK_PHENOTYPIC_FEATURE,
+            BIOLINK_GENE_ASSOCIATED_WITH_CONDITION,
+            BIOLINK_TREATS,
+            BIOLINK_HAS_PHENOTYPE,
+            )
 
     if outcome is None:
         raise QueryBuildError('You must specify an outcome CURIE.')
@@ -119,6 +154,14 @@ def build_wildcard_query(
         batch_drugs=None,
         batch_diseases=None,
         ):
+    # Import statement
+    from trapi_model.biolink.constants import (
+            BIOLINK_GENE,
+            BIOLINK_DRUG,
+            BIOLINK_DISEASE_ENTITY,
+            BIOLINK_GENE_ASSOCIATED_WITH_CONDITION,
+            BIOLINK_TREATS,
+            )
 
     if wildcard_category is None:
         QueryBuildError('Wildcard category can not be None.')
@@ -167,6 +210,15 @@ def build_onehop_query(
         trapi_version='1.1',
         biolink_version=None,
         ):
+    # Import statement
+    from trapi_model.query import Query
+    from trapi_model.message import Message
+    from trapi_model.biolink.constants import (
+            BIOLINK_GENE,
+            BIOLINK_DRUG,
+            BIOLINK_DISEASE,
+            )
+
     # Initialize query
     message = Message(trapi_version, biolink_version)
     q = message.query_graph
@@ -177,7 +229,7 @@ def build_onehop_query(
 
     # Add edge
     try:
-        edge_predicate = SUBJECT_TO_OBJECT_PREDICATE_MAP[q_subject_category[0]][q_object_category[0]]
+        edge_predicate = get_subject_to_object_predicate_map()[q_subject_category[0]][q_object_category[0]]
     except KeyError:
         raise QueryBuildError('Edge from {} to {} is not supported.'.format(q_subject_category, q_object_category))
 
@@ -0,0 +1,113 @@
+"""
+Caching of wildcard rankings independently of max_results.
+
+CHP answers a wildcard query with the probability result first, followed by the wildcard results
+ranked best first, at most max_results of them. The top k of a ranking fetched with a larger
+max_results is therefore the answer to the same query with max_results k, and a ranking shorter
+than its max_results is complete. The client caches each wildcard query once, under its payload
+without max_results, keeps the longest ranking fetched so far and slices it for smaller requests.
+"""
+
+import json
+
+
+def _messages(payload):
+    message = payload.get("message") if isinstance(payload, dict) else None
+    if isinstance(message, list):
+        return message
+    return [] if message is None else [message]
+
+
+def is_wildcard_message(message):
+    """ Returns True if some query graph node of message has no ids, i.e. is a wildcard.
+    """
+    try:
+        nodes = message["query_graph"]["nodes"]
+    except (KeyError, TypeError):
+        return False
+    return any(not (node.get("ids") or node.get("id")) for node in nodes.values())
+
+
+def is_ranked_request(params):
+    """ Returns True if params is a query payload with max_results and a wildcard message.
+    """
+    return isinstance(params, dict) and "max_results" in params and any(map(is_wildcard_message, _messages(params)))
+
+
+def without_max_results(params):
+    return {k: v for k, v in params.items() if k != 'max_results'}
+
+
+def pack(max_results, content):
+    """ Returns the cache value of a response body fetched with max_results.
+    """
+    return '{}\n'.format(max_results).encode('ascii') + content
+
+
+def unpack(value):
+    """ Returns (max_results, response body) of a cache value made by pack.
+    """
+    header, _, content = value.partition(b'\n')
+    return int(header), content
+
+
+def _prune(message):
+    """ Drops the knowledge graph nodes and edges no result of message binds anymore.
+    """
+    kg = message.get("knowledge_graph")
+    if not isinstance(kg, dict) or not isinstance(kg.get("edges"), dict) or not isinstance(kg.get("nodes"), dict):
+        return message
+    node_ids, edge_ids = set(), set()
+    for result in message["results"]:
+        for bindings in (result.get("node_bindings") or {}).values():
+            node_ids.update(binding.get("id") for binding in bindings)
+        for bindings in (result.get("edge_bindings") or {}).values():
+            edge_ids.update(binding.get("id") for binding in bindings)
+    edges = {edge_id: edge for edge_id, edge in kg["edges"].items() if edge_id in edge_ids}
+    for edge in edges.values():
+        node_ids.update((edge.get("subject"), edge.get("object")))
+    nodes = {node_id: node for node_id, node in kg["nodes"].items() if node_id in node_ids}
+    return dict(message, knowledge_graph=dict(kg, nodes=nodes, edges=edges))
+
+
+def _slice_message(message, max_results):
+    results = message.get("results") if isinstance(message, dict) else None
+    if not results or len(results) <= max_results + 1 or not is_wildcard_message(message):
+        return message
+    # The probability result, then the top max_results wildcard results.
+    return _prune(dict(message, results=results[:max_results + 1]))
+
+
+def _exhausted(message, fetched_max_results):
+    if not is_wildcard_message(message):
+        return True
+    return len(message.get("results") or []) - 1 < fetched_max_results
+
+
+def covers(value, max_results):
+    """ Returns True if the cache value holds the answer to a request for max_results, i.e. was
+    fetched with at least max_results or is a complete ranking.
+    """
+    fetched_max_results, content = unpack(value)
+    if fetched_max_results >= max_results:
+        return True
+    messages = _messages(json.loads(content.decode('utf-8')))
+    return all(_exhausted(m, fetched_max_results) for m in messages)
+
+
+def serve(value, max_results):
+    """ Returns the response to a request for max_results derived from a cache value, or None if the
+    cached ranking is shorter than max_results and may not be complete.
+    """
+    fetched_max_results, content = unpack(value)
+    response = json.loads(content.decode('utf-8'))
+    messages = _messages(response)
+    if max_results > fetched_max_results and not all(_exhausted(m, fetched_max_results) for m in messages):
+        return None
+    if isinstance(response.get("message"), list):
+        response["message"] = [_slice_message(m, max_results) for m in messages]
+    elif messages:
+        response["message"] = _slice_message(messages[0], max_results)
+    if "max_results" in response:
+        response["max_results"] = max_results
+    return response
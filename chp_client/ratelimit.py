@@ -0,0 +1,117 @@
+"""
+Token bucket rate limiters for CHP requests.
+"""
+
+import json
+import threading
+import time
+
+try:
+    import fcntl
+    file_locking_avail = True
+except ImportError:
+    file_locking_avail = False
+
+
+class TokenBucket:
+    """ Thread safe token bucket allowing rate requests per second on average and bursts of up to
+    burst requests.
+
+    Args:
+        rate: the number of tokens added per second.
+        burst: the bucket capacity. Default: max(1, rate).
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive.')
+        self.rate = rate
+        self.burst = max(1, rate) if burst is None else burst
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A copy in another process starts full, with its own lock.
+        return {"rate": self.rate, "burst": self.burst}
+
+    def __setstate__(self, state):
+        self.__init__(state["rate"], state["burst"])
+
+    def _take(self, tokens):
+        """ Takes tokens if available and returns 0, otherwise returns the seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """ Blocks until tokens are available and takes them. Returns True once they are taken, or
+        False right away, without waiting, if they would not be available within timeout seconds.
+        """
+        start = time.monotonic()
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return True
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                return False
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """ Token bucket whose state lives in a file, so that every process (and thread) using the same
+    path shares one budget. Instances pickle as their path and settings, so a client handed to a
+    multiprocessing pool keeps drawing from the same bucket. Requires POSIX file locking.
+
+    Args:
+        path: the bucket state file. It is created if it does not exist.
+        rate: the number of tokens added per second.
+        burst: the bucket capacity. Default: max(1, rate).
+    """
+
+    def __init__(self, path, rate, burst=None):
+        if not file_locking_avail:
+            raise RuntimeError('SharedTokenBucket requires fcntl file locking, which is not available.')
+        super().__init__(rate, burst)
+        self.path = path
+        # Make sure the state file exists so every process can lock it.
+        with open(self.path, 'a'):
+            pass
+
+    def __getstate__(self):
+        return {"path": self.path, "rate": self.rate, "burst": self.burst}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["rate"], state["burst"])
+
+    def _take(self, tokens):
+        with open(self.path, 'r+') as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                # Wall clock time, since monotonic clocks are not comparable across processes.
+                now = time.time()
+                try:
+                    state = json.load(state_file)
+                    available = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+                except (ValueError, KeyError):
+                    # A new or corrupt state file starts full.
+                    available = self.burst
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0
+                else:
+                    wait = (tokens - available) / self.rate
+                state_file.seek(0)
+                state_file.truncate()
+                json.dump({"tokens": available, "updated": now}, state_file)
+                # Flush before unlocking; other processes read through the shared page cache.
+                state_file.flush()
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+        return wait
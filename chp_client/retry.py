@@ -0,0 +1,190 @@
+"""
+Retry policy and circuit breakers for CHP endpoint requests.
+"""
+
+import random
+import threading
+import time
+
+from requests.exceptions import ConnectionError, Timeout, ChunkedEncodingError
+
+from chp_client.exceptions import CircuitOpenError
+
+# Transport errors after which a request may be retried.
+RETRYABLE_EXCEPTIONS = (ConnectionError, Timeout, ChunkedEncodingError)
+# Statuses worth retrying for idempotent requests.
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+# Statuses that guarantee the server did not process the request, so any method may be retried.
+UNPROCESSED_STATUSES = (429, 503)
+# CHP's POST endpoints only compute answers to queries, so POSTs are retried like GETs.
+IDEMPOTENT_METHODS = ('GET', 'POST')
+
+
+class RetryPolicy:
+    """ When and how long to wait before retrying a failed request.
+
+    Waits grow exponentially (backoff * 2 ** attempt, capped at max_backoff) with full jitter, and
+    a server's Retry-After header is honoured when it asks for a longer wait.
+
+    Args:
+        attempts: the total number of attempts, including the first. 1 disables retries.
+        backoff: the base wait in seconds.
+        max_backoff: the longest wait in seconds.
+        jitter: if True, wait a uniformly random time up to the exponential wait.
+        retry_statuses: the response statuses to retry for idempotent methods.
+        idempotent_methods: the HTTP methods that may be retried after a transport error or any
+            of retry_statuses. Other methods are only retried on statuses in UNPROCESSED_STATUSES.
+    """
+
+    def __init__(
+            self,
+            attempts=3,
+            backoff=0.5,
+            max_backoff=30.0,
+            jitter=True,
+            retry_statuses=RETRYABLE_STATUSES,
+            idempotent_methods=IDEMPOTENT_METHODS,
+            ):
+        if attempts < 1:
+            raise ValueError('attempts must be at least 1.')
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.idempotent_methods = frozenset(m.upper() for m in idempotent_methods)
+
+    def should_retry_status(self, method, status, attempt):
+        """ Returns True if a response with status to the attempt-th (0 based) try should be retried.
+        """
+        if attempt + 1 >= self.attempts:
+            return False
+        if status in UNPROCESSED_STATUSES:
+            return True
+        return status in self.retry_statuses and method.upper() in self.idempotent_methods
+
+    def should_retry_exception(self, method, exception, attempt):
+        """ Returns True if the attempt-th (0 based) try failing with exception should be retried.
+        """
+        if attempt + 1 >= self.attempts:
+            return False
+        return isinstance(exception, RETRYABLE_EXCEPTIONS) and method.upper() in self.idempotent_methods
+
+    def delay(self, attempt, retry_after=None):
+        """ Returns the number of seconds to wait after the attempt-th (0 based) try.
+        """
+        wait = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if self.jitter:
+            wait = random.uniform(0, wait)
+        if retry_after is not None:
+            try:
+                wait = max(wait, min(float(retry_after), self.max_backoff))
+            except ValueError:
+                # HTTP-date Retry-After values are not worth parsing here.
+                pass
+        return wait
+
+
+class CircuitBreaker:
+    """ Fails requests fast while an endpoint is down.
+
+    After failure_threshold consecutive failures the breaker opens and every request raises
+    CircuitOpenError. Once reset_timeout seconds have passed a single trial request is let through.
+    Its success closes the breaker and its failure opens it again.
+
+    Args:
+        failure_threshold: the number of consecutive failures that opens the breaker.
+        reset_timeout: the number of seconds to stay open before letting a trial request through.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """ Raises CircuitOpenError if a request may not be sent right now.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and retry_in <= 0:
+                # Let this request through as the trial. Everyone else keeps failing fast.
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(self.name, max(retry_in, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def available(self):
+        """ Returns True if before_request would currently let a request through.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            return self.state == self.OPEN and self._opened_at + self.reset_timeout <= time.monotonic()
+
+    def record_abort(self):
+        """ Records a request that ended without telling anything about the endpoint, e.g. one
+        whose payload could not be encoded. A trial request is given back to the next caller.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """ Hands out one CircuitBreaker per endpoint url. Share a registry between clients to have
+    them share breaker state.
+
+    Args:
+        failure_threshold: passed to every CircuitBreaker.
+        reset_timeout: passed to every CircuitBreaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A copy in another process starts with every breaker closed.
+        return {"failure_threshold": self.failure_threshold, "reset_timeout": self.reset_timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, url):
+        with self._lock:
+            if url not in self._breakers:
+                self._breakers[url] = CircuitBreaker(
+                        url,
+                        failure_threshold=self.failure_threshold,
+                        reset_timeout=self.reset_timeout,
+                        )
+            return self._breakers[url]
+
+    def states(self):
+        """ Returns a dictionary of endpoint url to breaker state.
+        """
+        with self._lock:
+            return {url: breaker.state for url, breaker in self._breakers.items()}
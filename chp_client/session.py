@@ -0,0 +1,38 @@
+"""
+Pooled HTTP session helpers for CHP clients.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of distinct host pools kept by a session.
+DEFAULT_POOL_CONNECTIONS = 10
+# Maximum number of keep-alive connections kept open per host.
+DEFAULT_POOL_MAXSIZE = 10
+
+
+def build_session(
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        pool_block=False,
+        ):
+    """ Returns a keep-alive requests session with a pooled adapter mounted for http and https.
+
+    A single session can be handed to several clients (get_client(session=...)) so that they all
+    draw from one connection pool.
+
+    Args:
+        pool_connections: the number of distinct host pools to keep.
+        pool_maxsize: the maximum number of connections kept alive per host.
+        pool_block: if True, wait for a free connection once pool_maxsize connections to a host
+            are in use instead of opening a throwaway one.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,91 @@
+"""
+Request coalescing: concurrent identical requests share one round trip.
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from chp_client.exceptions import DeadlineExceeded
+
+
+class SingleFlight:
+    """ Thread safe table of calls in flight by key. The first caller of a key runs the call, and
+    callers arriving with the same key before it finishes wait for and share its outcome, including
+    its exception, except for the exceptions listed in retry_on of do(). May be shared between
+    clients.
+    """
+
+    def __init__(self):
+        # key -> Future of the call in flight
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __getstate__(self):
+        # A copy in another process has nothing in flight.
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = {"calls": 0, "coalesced": 0}
+
+    def stats(self):
+        """ Returns the number of calls run, the number of callers that shared another caller's call
+        instead, and the number of calls in flight.
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+    def do(self, key, func, deadline=None, retry_on=()):
+        """ Returns (shared, func()), where shared is True if the result came from a call made by
+        another caller with the same key.
+
+        Args:
+            key: what identifies equal calls.
+            func: the call, taking no arguments.
+            deadline: an optional chp_client.deadline.Deadline bounding how long to wait for another
+                caller's call.
+            retry_on: exception types that only reflect the budget of the caller that made the
+                call, e.g. its deadline passing. A waiter receiving one makes the call again, or
+                joins the next caller's, within its own budget.
+
+        Raises:
+            DeadlineExceeded: if deadline passes while waiting for another caller's call.
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+                    self._counts["calls"] += 1
+                else:
+                    self._counts["coalesced"] += 1
+            if leader:
+                break
+            try:
+                return True, future.result(timeout=None if deadline is None else deadline.remaining())
+            except FutureTimeoutError:
+                raise DeadlineExceeded(deadline)
+            except retry_on:
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded(deadline)
+        try:
+            result = func()
+        except BaseException as ex:
+            self._finish(key)
+            future.set_exception(ex)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return False, result
+
+    def _finish(self, key):
+        # Later callers start a call of their own, e.g. one answered from the response cache.
+        with self._lock:
+            del self._calls[key]
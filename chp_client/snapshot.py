@@ -0,0 +1,59 @@
+"""
+On-disk JSON snapshots of endpoint data, so that a new process can start without a round trip.
+
+Snapshots live in $CHP_CLIENT_CACHE_DIR, or ~/.cache/chp_client if it is not set.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'chp_client')
+
+
+def cache_dir():
+    """ Returns the directory snapshots are kept in.
+    """
+    return os.environ.get('CHP_CLIENT_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def snapshot_path(name):
+    return os.path.join(cache_dir(), '{}.json'.format(name))
+
+
+def read_snapshot(name):
+    """ Returns (data, age in seconds) of the snapshot called name, or (None, None) if there is no
+    readable snapshot.
+    """
+    try:
+        with open(snapshot_path(name)) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        return snapshot["data"], time.time() - snapshot["saved"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def write_snapshot(name, data):
+    """ Saves data (anything JSON serializable) as the snapshot called name and returns True, or
+    logs why it could not and returns False.
+    """
+    path = snapshot_path(name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so that concurrent readers never see a partial snapshot.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump({"saved": time.time(), "data": data}, tmp_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as ex:
+        logger.warning('Could not save snapshot %s: %s', path, ex)
+        return False
+    return True
@@ -0,0 +1,148 @@
+"""
+Incremental parsing of large JSON responses.
+"""
+
+import codecs
+import json
+import re
+
+# Size (bytes) of the pieces a streamed response body is read in.
+DEFAULT_READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_TERMINATOR = re.compile(r'[,\]}\s]')
+
+
+class _Scanner:
+    """ Splits a stream of byte chunks into complete top level JSON value texts.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += self._decoder.decode(chunk)
+                return True
+        if not self._eof:
+            self._buf += self._decoder.decode(b'', final=True)
+            self._eof = True
+        return False
+
+    def peek(self):
+        """ Returns the next non whitespace character without consuming it, or None at the end.
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Malformed JSON stream: expected {!r} at {!r}.'.format(
+                char, self._buf[self._pos:self._pos + 20]))
+        self._pos += 1
+
+    def read_value(self):
+        """ Consumes and returns the text of the next complete JSON value.
+        """
+        if self.peek() is None:
+            raise ValueError('Malformed JSON stream: unexpected end of data.')
+        # Drop consumed text so the buffer only ever holds the value being read.
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        if self._buf[0] not in '{["':
+            end = self._scan_scalar()
+        else:
+            end = self._scan_container()
+        self._pos = end
+        return self._buf[:end]
+
+    def _scan_scalar(self):
+        i = 1
+        while True:
+            match = _SCALAR_TERMINATOR.search(self._buf, i)
+            if match is not None:
+                return match.start()
+            i = len(self._buf)
+            if not self._fill():
+                return i
+
+    def _scan_container(self):
+        # Jump between structural characters with regexes rather than stepping through every one.
+        depth = 0
+        in_string = False
+        i = 0
+        while True:
+            match = (_STRING_SPECIAL if in_string else _STRUCTURAL).search(self._buf, i)
+            if match is None:
+                # An escape may have pointed i past the end of the buffer, so never move it back.
+                i = max(i, len(self._buf))
+                if not self._fill():
+                    raise ValueError('Malformed JSON stream: unexpected end of data.')
+                continue
+            c = match.group()
+            i = match.end()
+            if in_string:
+                if c == '\\':
+                    i += 1
+                    continue
+                in_string = False
+                if depth == 0:
+                    return i
+            elif c == '"':
+                in_string = True
+            elif c in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return i
+
+
+def iter_json_array_items(chunks, key):
+    """ Yields the parsed elements of the array stored under key in a streamed JSON object.
+
+    Only one element is held in memory at a time, so callers can start on the first element before
+    the rest of the body has arrived. Other top level members of the object are skipped.
+
+    Args:
+        chunks: an iterable of utf-8 byte strings, e.g. response.iter_content(...).
+        key: the top level key whose array should be streamed.
+    """
+    scanner = _Scanner(chunks)
+    scanner.expect('{')
+    while True:
+        c = scanner.peek()
+        if c == '}':
+            return
+        if c == ',':
+            scanner.expect(',')
+            continue
+        member = json.loads(scanner.read_value())
+        scanner.expect(':')
+        if member != key:
+            scanner.read_value()
+            continue
+        if scanner.peek() != '[':
+            raise ValueError('Expected {!r} to hold a JSON array.'.format(key))
+        scanner.expect('[')
+        while True:
+            c = scanner.peek()
+            if c == ']':
+                scanner.expect(']')
+                break
+            if c == ',':
+                scanner.expect(',')
+                continue
+            yield json.loads(scanner.read_value())
@@ -0,0 +1,203 @@
+"""
+Pluggable HTTP transports behind ChpClient.
+
+A transport sends one request and returns a response object with the requests.Response interface
+the client relies on: status_code, headers, url, content, text, json(), iter_content(chunk_size)
+and close(). Transport errors are raised as requests exceptions so that the retry policy treats
+every transport alike.
+
+Transports pickle as their settings, so a client sent to another process opens its own connections
+there on first use.
+"""
+
+import importlib.util
+import json
+
+from requests.exceptions import ConnectionError, Timeout, ChunkedEncodingError
+
+from chp_client.session import (
+        build_session,
+        DEFAULT_POOL_CONNECTIONS,
+        DEFAULT_POOL_MAXSIZE,
+        )
+
+# httpx is slow to import, so only look for it here and import it when an Http2Transport is built.
+http2_avail = all(importlib.util.find_spec(name) is not None for name in ('httpx', 'h2'))
+httpx = None
+
+
+class Transport:
+    """ Interface of the HTTP layer used by ChpClient.
+    """
+
+    def request(self, method, url, data=None, headers=None, stream=False, timeout=None):
+        """ Sends a request and returns its response.
+
+        Args:
+            method: the HTTP method.
+            url: the full url.
+            data: the request body, as bytes or an iterable of bytes.
+            headers: a dictionary of request headers.
+            stream: if True, return as soon as the headers arrive and leave the body to be read
+                with iter_content.
+            timeout: the number of seconds to wait for the server, or None to wait forever.
+        """
+        raise NotImplementedError
+
+    def wire_bytes(self, response, default):
+        """ Returns the number of (possibly compressed) body bytes read off the wire for response,
+        or default if the transport can not tell.
+        """
+        return default
+
+    def close(self):
+        """ Closes every pooled connection.
+        """
+        pass
+
+
+class RequestsTransport(Transport):
+    """ The default HTTP/1.1 transport, built on a pooled keep-alive requests session.
+
+    Args:
+        session: an optional requests session to share (see chp_client.session.build_session).
+            If None, the transport builds and owns one from the pool arguments.
+        pool_connections: the number of distinct host pools kept by an owned session.
+        pool_maxsize: the maximum number of keep-alive connections per host of an owned session.
+        pool_block: if True, an owned session waits for a free connection instead of opening
+            more than pool_maxsize connections to one host.
+    """
+
+    def __init__(
+            self,
+            session=None,
+            pool_connections=DEFAULT_POOL_CONNECTIONS,
+            pool_maxsize=DEFAULT_POOL_MAXSIZE,
+            pool_block=False,
+            ):
+        self._pool_kwargs = {
+                "pool_connections": pool_connections,
+                "pool_maxsize": pool_maxsize,
+                "pool_block": pool_block,
+                }
+        self._owns_session = session is None
+        self.session = build_session(**self._pool_kwargs) if session is None else session
+
+    def __getstate__(self):
+        # A shared session can not follow to another process, so the copy owns a new one.
+        return self._pool_kwargs
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def request(self, method, url, data=None, headers=None, stream=False, timeout=None):
+        return self.session.request(method, url, data=data, headers=headers, stream=stream, timeout=timeout)
+
+    def wire_bytes(self, response, default):
+        # urllib3 counts the (possibly compressed) bytes it pulled off the socket.
+        try:
+            return response.raw.tell()
+        except AttributeError:
+            return default
+
+    def close(self):
+        # A shared session is left open for the other clients using it.
+        if self._owns_session:
+            self.session.close()
+
+
+class _HttpxResponse:
+    """ Adapts an httpx response to the requests.Response interface used by ChpClient.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=None):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as ex:
+            raise Timeout(str(ex))
+        except httpx.TransportError as ex:
+            raise ChunkedEncodingError(str(ex))
+
+    def close(self):
+        self._response.close()
+
+
+class Http2Transport(Transport):
+    """ HTTP/2 transport that multiplexes concurrent requests over a single connection per host.
+    Requires httpx and h2 (pip install httpx[http2]).
+
+    HTTP/2 is negotiated through TLS for https urls. Plain http urls need prior_knowledge=True,
+    which speaks cleartext HTTP/2 (h2c) without an HTTP/1.1 fallback.
+
+    Args:
+        max_connections: the maximum number of connections kept to all hosts.
+        max_keepalive_connections: the maximum number of idle connections kept open.
+        prior_knowledge: if True, use cleartext HTTP/2 for http urls.
+    """
+
+    def __init__(self, max_connections=DEFAULT_POOL_MAXSIZE, max_keepalive_connections=None, prior_knowledge=False):
+        global httpx
+        if not http2_avail:
+            raise RuntimeError('Http2Transport requires httpx and h2. Install them with: pip install httpx[http2]')
+        import httpx
+        self._init_kwargs = {
+                "max_connections": max_connections,
+                "max_keepalive_connections": max_keepalive_connections,
+                "prior_knowledge": prior_knowledge,
+                }
+        limits = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                )
+        self._client = httpx.Client(http1=not prior_knowledge, http2=True, limits=limits, timeout=None)
+
+    def __getstate__(self):
+        return self._init_kwargs
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def request(self, method, url, data=None, headers=None, stream=False, timeout=None):
+        try:
+            request = self._client.build_request(method, url, content=data, headers=headers, timeout=timeout)
+            try:
+                response = self._client.send(request, stream=True)
+            except httpx.RemoteProtocolError:
+                # The server closed the shared connection (e.g. a GOAWAY after its per connection
+                # request limit), failing every stream on it at once. Resend once on a fresh
+                # connection, unless the body was a stream that has already been consumed.
+                if not (data is None or isinstance(data, bytes)):
+                    raise
+                request = self._client.build_request(method, url, content=data, headers=headers, timeout=timeout)
+                response = self._client.send(request, stream=True)
+            if not stream:
+                response.read()
+        except httpx.TimeoutException as ex:
+            raise Timeout(str(ex))
+        except httpx.TransportError as ex:
+            raise ConnectionError(str(ex))
+        return _HttpxResponse(response)
+
+    def wire_bytes(self, response, default):
+        return response._response.num_bytes_downloaded
+
+    def close(self):
+        self._client.close()
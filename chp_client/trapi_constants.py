@@ -1,32 +1,113 @@
+"""
+TRAPI constants shared with the CHP endpoint.
+
+Constants are loaded lazily on first attribute access, from an on-disk snapshot of the endpoint's
+/constants/ (see chp_client.snapshot) or else from the defaults below. When the snapshot is
+missing or older than CONSTANTS_TTL it is refreshed in a background thread, so neither importing
+this module nor reading a constant ever waits on the network.
+"""
+
 import logging
+import threading
 
 from chp_client import get_client
+from chp_client.snapshot import read_snapshot, write_snapshot
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Try to pull most up-to-date constants from endpoint.
-try:
-    client = get_client()
-    constants = client.constants()
-    logger.info('Loaded most recent constants from endpoint')
-except:
-    logger.warning('Could not reach constants endpoint, so loading default entities and predicates. May experience compatiability issues.')
-    constants = {}
-
-# Biolink Entities
-BIOLINK_GENE = constants.pop("BIOLINK_GENE", 'biolink:Gene')
-BIOLINK_DRUG = constants.pop("BIOLINK_DRUG", 'biolink:Drug')
-BIOLINK_DISEASE = constants.pop("BIOLINK_DISEASE", 'biolink:Disease')
-BIOLINK_PHENOTYPIC_FEATURE = constants.pop("BIOLINK_PHENOTYPIC_FEATURE", 'biolink:PhenotypicFeature')
-
-# Edge Property Constants
-BIOLINK_CONTRIBUTION = constants.pop("BIOLINK_CONTRIBUTION", "biolink:has_evidence")
-BIOLINK_PROBABILITY = constants.pop("BIOLINK_PROBABILITY", "biolink:has_confidence_level")
-
-# Biolink Predicate/Association/Slot Constants
-BIOLINK_GENE_TO_DISEASE_PREDICATE = constants.pop("BIOLINK_GENE_TO_DISEASE_PREDICATE", 'biolink:gene_associated_with_condition')
-BIOLINK_CHEMICAL_TO_DISEASE_OR_PHENOTYPIC_FEATURE_PREDICATE = constants.pop("BIOLINK_CHEMICAL_TO_DISEASE_OR_PHENOTYPIC_FEATURE_PREDICATE", 'biolink:treats')
-BIOLINK_CHEMICAL_TO_GENE_PREDICATE = constants.pop("BIOLINK_CHEMICAL_TO_GENE_PREDICATE", 'biolink:interacts_with')
-BIOLINK_GENE_TO_CHEMICAL_PREDICATE = constants.pop("BIOLINK_GENE_TO_CHEMICAL_PREDICATE", 'biolink:interacts_with')
-BIOLINK_DISEASE_TO_PHENOTYPIC_FEATURE_PREDICATE = constants.pop("BIOLINK_DISEASE_TO_PHENOTYPIC_FEATURE_PREDICATE", 'biolink:has_phenotype')
+# Seconds a snapshot of the endpoint's constants is used before it is refreshed.
+CONSTANTS_TTL = 24 * 60 * 60
+# Seconds a refresh waits for the endpoint.
+REFRESH_TIMEOUT = 10
+# Url of the endpoint constants are refreshed from. None is the default client url.
+ENDPOINT_URL = None
+
+_SNAPSHOT_NAME = 'trapi_constants'
+
+DEFAULTS = {
+        # Biolink Entities
+        "BIOLINK_GENE": 'biolink:Gene',
+        "BIOLINK_DRUG": 'biolink:Drug',
+        "BIOLINK_DISEASE": 'biolink:Disease',
+        "BIOLINK_PHENOTYPIC_FEATURE": 'biolink:PhenotypicFeature',
+        # Edge Property Constants
+        "BIOLINK_CONTRIBUTION": 'biolink:has_evidence',
+        "BIOLINK_PROBABILITY": 'biolink:has_confidence_level',
+        # Biolink Predicate/Association/Slot Constants
+        "BIOLINK_GENE_TO_DISEASE_PREDICATE": 'biolink:gene_associated_with_condition',
+        "BIOLINK_CHEMICAL_TO_DISEASE_OR_PHENOTYPIC_FEATURE_PREDICATE": 'biolink:treats',
+        "BIOLINK_CHEMICAL_TO_GENE_PREDICATE": 'biolink:interacts_with',
+        "BIOLINK_GENE_TO_CHEMICAL_PREDICATE": 'biolink:interacts_with',
+        "BIOLINK_DISEASE_TO_PHENOTYPIC_FEATURE_PREDICATE": 'biolink:has_phenotype',
+        }
+
+_constants = None
+_refreshing = False
+_lock = threading.Lock()
+
+
+def _start_refresh():
+    global _refreshing
+    # Called with _lock held.
+    if not _refreshing:
+        _refreshing = True
+        threading.Thread(target=refresh, name='chp_client_constants', daemon=True).start()
+
+
+def load():
+    """ Returns the dictionary of constants, reading the snapshot on first use and starting a
+    background refresh if it is missing or stale.
+    """
+    global _constants
+    with _lock:
+        if _constants is None:
+            snapshot, age = read_snapshot(_SNAPSHOT_NAME)
+            _constants = dict(DEFAULTS)
+            if snapshot is None:
+                logger.info('No constants snapshot yet, so using default entities and predicates until it is fetched.')
+            else:
+                _constants.update(snapshot)
+            if snapshot is None or age > CONSTANTS_TTL:
+                _start_refresh()
+        return _constants
+
+
+def refresh(url=None, timeout=REFRESH_TIMEOUT):
+    """ Fetches the constants from the endpoint's /constants/, saves them as the snapshot and
+    updates the loaded values. Returns True on success. On failure the current values are kept.
+    """
+    global _constants, _refreshing
+    try:
+        try:
+            with get_client(url=url or ENDPOINT_URL, timeout=timeout) as client:
+                constants = client.constants(verbose=False)
+        except Exception as ex:
+            logger.warning(
+                    'Could not reach constants endpoint (%s), so keeping the %s entities and predicates. '
+                    'May experience compatibility issues.', ex, 'default' if _constants is None else 'loaded')
+            return False
+        write_snapshot(_SNAPSHOT_NAME, constants)
+        with _lock:
+            updated = dict(DEFAULTS)
+            updated.update(constants)
+            _constants = updated
+        logger.info('Loaded most recent constants from endpoint')
+        return True
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    constants = load()
+    try:
+        return constants[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(load()))
@@ -0,0 +1,169 @@
+"""
+Resumable warming of a client's response cache from a corpus of queries or a query grid.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+
+from chp_client.client import ChpClient
+from chp_client.concurrency import bounded_map
+from chp_client.fingerprint import fingerprint
+
+DEFAULT_WARMING_WORKERS = 4
+
+
+def iter_grid(builder, axes, fixed=None):
+    """ Yields builder(**kwargs) for every combination of the axes values, e.g. every gene, drug and
+    survival time.
+
+    Args:
+        builder: a query builder such as chp_client.query.build_standard_query.
+        axes: a dictionary of builder argument to the list of values it ranges over.
+        fixed: a dictionary of builder arguments shared by every query.
+
+    Example:
+        iter_grid(
+            build_standard_query,
+            {"genes": [[gene] for gene in genes], "drugs": [[drug] for drug in drugs],
+             "outcome_value": survival_times},
+            fixed={"outcome": 'EFO:0000714', "outcome_op": '>', "disease": 'MONDO:0007254'},
+            )
+    """
+    names = list(axes)
+    for values in itertools.product(*(axes[name] for name in names)):
+        kwargs = dict(fixed or {})
+        kwargs.update(zip(names, values))
+        yield builder(**kwargs)
+
+
+def iter_grid_spec(spec):
+    """ Yields the queries of a JSON grid spec: {"builder": name of a chp_client.query builder,
+    "axes": {...}, "fixed": {...}}. See iter_grid.
+    """
+    # Import statement
+    from chp_client import query
+    builder = getattr(query, spec["builder"], None)
+    if builder is None or not spec["builder"].startswith('build_'):
+        raise ValueError('Unknown query builder: {}'.format(spec["builder"]))
+    return iter_grid(builder, spec["axes"], spec.get("fixed"))
+
+
+class Checkpoint:
+    """ Append-only file of the keys of finished work, so that an interrupted run resumes where it
+    stopped. A line cut short by a crash is ignored.
+
+    Args:
+        path: the checkpoint file, or None to keep progress in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.done = set()
+        self._file = None
+        if path is None:
+            return
+        if os.path.exists(path):
+            with open(path) as f_:
+                for line in f_:
+                    if line.endswith('\n'):
+                        self.done.add(line.strip())
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a')
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def add(self, key):
+        self.done.add(key)
+        if self._file is not None:
+            self._file.write(key + '\n')
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CacheWarmer:
+    """ Runs queries through a client so that their responses land in its response cache, with at
+    most max_workers queries in flight, and records each finished query in a checkpoint. Queries
+    already in the checkpoint are skipped, and failed ones are left out of it to be retried by the
+    next run. Checkpoint keys include the endpoint's versions, like the cache entries, so that
+    everything is warmed again after an upgrade.
+
+    Args:
+        client: a ChpClient with a response cache, e.g. after client._set_caching().
+        checkpoint: the checkpoint file path, or None to not persist progress. Requires the
+            client's cache to persist to disk.
+        max_workers: the number of queries in flight. The client's rate_limit applies as well.
+        max_results: the max_results of every query, part of what is cached.
+    """
+
+    def __init__(self, client, checkpoint=None, max_workers=DEFAULT_WARMING_WORKERS, max_results=10):
+        if client._cache is None:
+            raise ValueError('The client has no response cache to warm. Call _set_caching() first.')
+        if checkpoint is not None and client._cache.disk is None:
+            # The checkpoint would outlive the warmed responses.
+            raise ValueError('A checkpoint requires a persistent response cache. Call _set_caching() first.')
+        self._client = client
+        self._checkpoint_path = checkpoint
+        self.max_workers = max_workers
+        self.max_results = max_results
+
+    def key(self, q, versions):
+        """ Returns the checkpoint key of the JSON query q: a digest of the endpoint's /versions/
+        answer, then the fingerprint of q with max_results.
+        """
+        tag = hashlib.sha1(json.dumps(versions, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return '{}:{}'.format(tag, fingerprint(dict(q, max_results=self.max_results)))
+
+    def _warm_one(self, item):
+        key, q = item
+        try:
+            # The synchronous wrapper, so that async clients can be warmed too.
+            ChpClient._query(self._client, q, max_results=self.max_results, verbose=False)
+        except Exception as ex:
+            return key, ex
+        return key, None
+
+    def run(self, queries, verbose=False):
+        """ Warms the cache with queries (TRAPI query dictionaries or trapi_model queries, e.g. from
+        iter_grid) and returns counts of queries warmed, skipped as already done, and failed.
+        """
+        versions = self._client._current_versions()
+        checkpoint = Checkpoint(self._checkpoint_path)
+        stats = {"warmed": 0, "skipped": 0, "failed": 0}
+
+        def _pending():
+            for q in queries:
+                if hasattr(q, 'to_dict'):
+                    # E.g. a trapi_model Query.
+                    q = q.to_dict()
+                key = self.key(q, versions)
+                if key in checkpoint:
+                    stats["skipped"] += 1
+                    continue
+                yield key, q
+
+        try:
+            results = bounded_map(self._warm_one, _pending(), self.max_workers, ordered=False)
+            for _, (key, error) in results:
+                if error is None:
+                    checkpoint.add(key)
+                    stats["warmed"] += 1
+                else:
+                    stats["failed"] += 1
+                    if verbose:
+                        print('Failed to warm a query: {}'.format(error))
+                if verbose and (stats["warmed"] + stats["failed"]) % 100 == 0:
+                    print(json.dumps(stats))
+        finally:
+            checkpoint.close()
+        return stats
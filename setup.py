@@ -13,6 +13,10 @@ REQUIRED_PACKAGES = [
     'requests'
 ]
 
+EXTRAS_REQUIRE = {
+    'http2': ['httpx[http2]'],
+}
+
 setup(
     name='chp_client',
     version=__version__,
@@ -21,6 +25,7 @@ setup(
     description='A light weight Python wrapper of the NCATS CHP Endpoint.',
     packages=find_packages(),
     install_requires=REQUIRED_PACKAGES,
-    python_requires='>=3.6'
+    extras_require=EXTRAS_REQUIRE,
+    python_requires='>=3.7'
 )
 
@@ -0,0 +1,190 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chp_client._version import __version__
+
+CURIES = {
+        "biolink:Gene": {
+            "ENSEMBL:ENSG00000132155": "RAF1",
+            "ENSEMBL:ENSG00000073803": "MAP3K13",
+            },
+        "biolink:Drug": {
+            "CHEMBL:CHEMBL88": "CYCLOPHOSPHAMIDE",
+            },
+        }
+
+
+CONSTANTS = {"BIOLINK_DRUG": 'biolink:ChemicalSubstance'}
+
+
+# What the stand-in server ranks for wildcard queries, best first.
+RANKED_GENES = ['ENSEMBL:G{}'.format(i) for i in range(5)]
+
+
+def rank_wildcards(message, max_results):
+    """ Answers a query graph with one wildcard node the way CHP does: the probability result,
+    then the top max_results wildcard results.
+    """
+    nodes = message["query_graph"]["nodes"]
+    wildcard = next((node_id for node_id, node in nodes.items() if not node.get("ids")), None)
+    if wildcard is None:
+        return message
+    edge_id = next(iter(message["query_graph"]["edges"]))
+    results = [{"node_bindings": {}, "edge_bindings": {edge_id: [{"id": 'kg_prob'}]}}]
+    kg = {"nodes": {}, "edges": {"kg_prob": {"subject": 'MONDO:1', "object": 'MONDO:1'}}}
+    for rank, curie in enumerate(RANKED_GENES[:max_results]):
+        kg["nodes"][curie] = {"name": 'GENE{}'.format(rank)}
+        kg["edges"]['kg{}'.format(rank)] = {"subject": curie, "object": 'MONDO:1'}
+        results.append({
+            "node_bindings": {wildcard: [{"id": curie}]},
+            "edge_bindings": {edge_id: [{"id": 'kg{}'.format(rank)}]},
+            })
+    return dict(message, results=results, knowledge_graph=kg)
+
+
+class StandInChpHandler(BaseHTTPRequestHandler):
+    """ Minimal stand-in for the CHP web service that echoes query messages back, ranking
+    RANKED_GENES for wildcard queries.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if size == 0:
+                    break
+                body += chunk
+        else:
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return json.loads(body) if body else {}
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_html_error(self, status=502):
+        body = b'<html><body>Bad Gateway</body></html>'
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._read_body()
+        self.server.requests.append(self.path)
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            return self._send_html_error()
+        if self.path == '/versions/':
+            self._send_json({"chp_client": self.server.version, "chp": self.server.chp_version})
+        elif self.path == '/curies/':
+            self._send_json(CURIES)
+        elif self.path == '/constants/':
+            self._send_json(CONSTANTS)
+        else:
+            self._send_json({})
+
+    def do_POST(self):
+        payload = self._read_body()
+        self.server.requests.append(self.path)
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            return self._send_html_error()
+        if self.server.slow_next > 0:
+            self.server.slow_next -= 1
+            time.sleep(1)
+        if self.path == '/query/':
+            message = rank_wildcards(payload["message"], payload["max_results"])
+            self._send_json({"message": message, "max_results": payload["max_results"]})
+        elif self.path == '/queryall/':
+            messages = [rank_wildcards(m, payload["max_results"]) for m in payload["message"]]
+            self._send_json({"message": messages})
+        else:
+            self._send_json({}, status=404)
+
+
+class StandInChpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler=StandInChpHandler):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.connections = 0
+        self.requests = []
+        self.fail_next = 0
+        self.slow_next = 0
+        self.version = __version__
+        self.chp_version = '3.0.0'
+        self.url = 'http://127.0.0.1:{}'.format(self.server_address[1])
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+_CACHE_DIR = tempfile.TemporaryDirectory()
+
+
+def use_temporary_cache_dir():
+    # Keep handshake and constants snapshots out of the user's cache directory.
+    os.environ['CHP_CLIENT_CACHE_DIR'] = _CACHE_DIR.name
+
+
+def make_query(i=0):
+    return {"message": {"query_graph": {"nodes": {"n0": {"ids": ['CURIE:{}'.format(i)]}}, "edges": {}}}}
+
+
+def make_gene_query(gene_id='n0', disease_id='n1', edge_id='e0', genes=('ENSEMBL:1', 'ENSEMBL:2'), reverse=False):
+    nodes = {
+            gene_id: {"ids": list(genes), "categories": ['biolink:Gene']},
+            disease_id: {"ids": ['MONDO:1'], "categories": ['biolink:Disease']},
+            }
+    subject, object_ = (disease_id, gene_id) if reverse else (gene_id, disease_id)
+    edges = {edge_id: {"subject": subject, "object": object_, "predicates": ['biolink:gene_associated_with_condition']}}
+    return {"message": {"query_graph": {"nodes": nodes, "edges": edges}}}
+
+
+class StandInServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInChpServer()
+
+    def tearDown(self):
+        self.server.stop()
@@ -0,0 +1,260 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+from chp_client import get_client
+from chp_client.cache import TieredCache, MemoryCache, DiskCache
+from chp_client.fingerprint import fingerprint, relabel_message
+from chp_client.exceptions import DeadlineExceeded
+from chp_client import handshake
+
+from standin import CURIES, RANKED_GENES, use_temporary_cache_dir, make_query, make_gene_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestResponseCache(StandInServerTestCase):
+    def test_memory_tier(self):
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            self.assertEqual(client.curies(verbose=False), CURIES)
+            self.assertEqual(client.curies(verbose=False), CURIES)
+            first = client.query(make_query(), verbose=False)
+            first["message"] = None
+            second = client.query(make_query(), verbose=False)
+            stats = client.cache_stats()
+        self.assertEqual(self.server.requests.count('/curies/'), 1)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+        # Callers get their own copy, so changing one result leaves the cache intact.
+        self.assertEqual(second["message"], make_query()["message"])
+        self.assertEqual(stats["memory_hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_disk_tier_outlives_client(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_db = os.path.join(tmp_dir, 'responses')
+            for _ in range(2):
+                with get_client(url=self.server.url) as client:
+                    client._set_caching(cache_db, verbose=False)
+                    client.query(make_query(), verbose=False)
+                    stats = client.cache_stats()
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+        self.assertEqual(stats["disk_hits"], 1)
+
+    def test_server_version_change_invalidates(self):
+        cache = TieredCache()
+        with get_client(url=self.server.url, cache=cache, handshake_ttl=0) as client:
+            client.query(make_query(), verbose=False)
+        self.server.chp_version = '3.0.1'
+        with get_client(url=self.server.url, cache=cache, handshake_ttl=0) as client:
+            client.query(make_query(), verbose=False)
+            client.query(make_query(), verbose=False)
+        self.assertEqual(self.server.requests.count('/query/'), 2)
+
+    def test_live_client_notices_upgrades(self):
+        for i, version_check in enumerate(('eager', 'off')):
+            handshake.clear_cache()
+            self.server.requests.clear()
+            with get_client(url=self.server.url, cache=TieredCache(), version_check=version_check,
+                            version_ttl=0) as client:
+                client.query(make_query(), verbose=False)
+                client.query(make_query(), verbose=False)
+                self.server.chp_version = '3.1.{}'.format(i)
+                client.query(make_query(), verbose=False)
+            self.assertEqual(self.server.requests.count('/query/'), 2)
+
+    def test_invalidate(self):
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            client.curies(verbose=False)
+            client.query(make_query(), verbose=False)
+            client.invalidate('/curies/')
+            client.curies(verbose=False)
+            client.query(make_query(), verbose=False)
+        self.assertEqual(self.server.requests.count('/curies/'), 2)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+
+    def test_eviction(self):
+        memory = MemoryCache(max_entries=2, max_bytes=10)
+        for key in 'abc':
+            memory.set(key, '/query/', b'xx', '', None)
+        self.assertIsNone(memory.get('a'))
+        memory.set('d', '/query/', b'x' * 9, '', None)
+        self.assertEqual(len(memory), 1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            disk = DiskCache(os.path.join(tmp_dir, 'cache.sqlite'), max_entries=3, max_bytes=100)
+            for key in 'abcd':
+                disk.set(key, '/query/', b'xx', '', None)
+            # Evicted in one batch down to 90% of max_entries.
+            self.assertIsNone(disk.get('a'))
+            self.assertIsNone(disk.get('b'))
+            self.assertEqual(disk.usage(), (2, 4))
+            disk.set('e', '/query/', b'x' * 99, '', None)
+            self.assertEqual(disk.usage(), (1, 99))
+            disk.close()
+
+    def test_disk_usage_is_shared(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'cache.sqlite')
+            first, second = DiskCache(path), DiskCache(path)
+            first.set('a', '/query/', b'xx', '', None)
+            second.set('a', '/query/', b'xxxx', '', None)
+            second.set('b', '/curies/', b'x', '', None)
+            self.assertEqual(first.usage(), (2, 5))
+            first.invalidate('/curies/')
+            self.assertEqual(second.usage(), (1, 4))
+            second.delete('a')
+            self.assertEqual(first.usage(), (0, 0))
+            first.close()
+            second.close()
+
+
+class TestCoalescing(StandInServerTestCase):
+    def _query_concurrently(self, client, queries):
+        self.server.slow_next = 1
+        results = [None] * len(queries)
+
+        def _run(i):
+            results[i] = client.query(queries[i], verbose=False)
+
+        threads = [threading.Thread(target=_run, args=(i,)) for i in range(len(queries))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_identical_queries_share_a_request(self):
+        queries = [make_gene_query('gene{}'.format(i), 'disease', 'e{}'.format(i)) for i in range(5)]
+        with get_client(url=self.server.url) as client:
+            results = self._query_concurrently(client, queries)
+            stats = client.coalescing_stats()
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+        self.assertEqual((stats["calls"], stats["coalesced"], stats["in_flight"]), (1, 4, 0))
+        # Each caller gets its own copy, named after its own query graph.
+        for i, res in enumerate(results):
+            self.assertIn('gene{}'.format(i), res["message"]["query_graph"]["nodes"])
+        self.assertIsNot(results[1]["message"], results[2]["message"])
+
+    def test_with_cache(self):
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            self._query_concurrently(client, [make_query()] * 3)
+            client.query(make_query(), verbose=False)
+            self.assertEqual(client.cache_stats()["memory_hits"], 1)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+
+    def test_leader_deadline_is_not_shared(self):
+        for i, deadline in enumerate([None, 5]):
+            errors = []
+
+            def _lead():
+                try:
+                    client.query(make_query(i), deadline=0.3, verbose=False)
+                except DeadlineExceeded as ex:
+                    errors.append(ex)
+
+            with get_client(url=self.server.url) as client:
+                self.server.slow_next = 1
+                leader = threading.Thread(target=_lead)
+                leader.start()
+                time.sleep(0.05)
+                res = client.query(make_query(i), deadline=deadline, verbose=False)
+                leader.join()
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(res["message"], make_query(i)["message"])
+        self.assertEqual(self.server.requests.count('/query/'), 4)
+
+    def test_disabled(self):
+        with get_client(url=self.server.url, coalesce=False) as client:
+            self._query_concurrently(client, [make_query()] * 3)
+            self.assertIsNone(client.coalescing_stats())
+        self.assertEqual(self.server.requests.count('/query/'), 3)
+
+
+class TestRankingCache(StandInServerTestCase):
+    def _gene_wildcard_query(self, gene_id='n0'):
+        q = make_gene_query(gene_id=gene_id)
+        q["message"]["query_graph"]["nodes"][gene_id]["ids"] = None
+        return q
+
+    def _ranked(self, res):
+        return [r["node_bindings"]["n0"][0]["id"] for r in res["message"]["results"][1:]]
+
+    def test_smaller_requests_are_sliced(self):
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            for max_results, sent in [(2, 1), (1, 1), (4, 2), (3, 2), (2, 2), (10, 3), (20, 3)]:
+                res = client.query(self._gene_wildcard_query(), max_results=max_results, verbose=False)
+                self.assertEqual(self._ranked(res), RANKED_GENES[:max_results])
+                self.assertEqual(res["max_results"], max_results)
+                self.assertEqual(self.server.requests.count('/query/'), sent)
+            # The knowledge graph only keeps what the kept results bind.
+            res = client.query(self._gene_wildcard_query(), max_results=1, verbose=False)
+            self.assertEqual(set(res["message"]["knowledge_graph"]["edges"]), {'kg_prob', 'kg0'})
+            self.assertEqual(set(res["message"]["knowledge_graph"]["nodes"]), {RANKED_GENES[0]})
+
+    def test_slower_shorter_ranking_does_not_replace_longer(self):
+        with get_client(url=self.server.url, cache=TieredCache(), coalesce=False) as client:
+            self.server.slow_next = 1
+            shorter = threading.Thread(
+                    target=client.query, args=(self._gene_wildcard_query(),), kwargs={"max_results": 1, "verbose": False})
+            shorter.start()
+            time.sleep(0.1)
+            client.query(self._gene_wildcard_query(), max_results=3, verbose=False)
+            shorter.join()
+            res = client.query(self._gene_wildcard_query(), max_results=3, verbose=False)
+        self.assertEqual(self._ranked(res), RANKED_GENES[:3])
+        self.assertEqual(self.server.requests.count('/query/'), 2)
+
+    def test_query_all(self):
+        queries = [self._gene_wildcard_query(), make_gene_query()]
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            client.query_all(queries, max_results=3, verbose=False)
+            res = client.query_all(queries, max_results=2, verbose=False)
+        self.assertEqual(self.server.requests.count('/queryall/'), 1)
+        self.assertEqual(self._ranked({"message": res["message"][0]}), RANKED_GENES[:2])
+        self.assertEqual(res["message"][1], make_gene_query()["message"])
+
+
+class TestFingerprint(StandInServerTestCase):
+    def test_invariance(self):
+        base = fingerprint(make_gene_query())
+        self.assertEqual(fingerprint(make_gene_query('gene', 'disease', 'x', genes=('ENSEMBL:2', 'ENSEMBL:1'))), base)
+        self.assertNotEqual(fingerprint(make_gene_query(reverse=True)), base)
+        self.assertNotEqual(fingerprint(make_gene_query(genes=('ENSEMBL:1', 'ENSEMBL:3'))), base)
+        # The order of a batch of messages is kept, since results come back in that order.
+        a, b = make_gene_query()["message"], make_gene_query(genes=('ENSEMBL:3',))["message"]
+        self.assertNotEqual(fingerprint({"message": [a, b]}), fingerprint({"message": [b, a]}))
+
+    def test_cache_hit_is_relabelled(self):
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            client.query(make_gene_query(), verbose=False)
+            res = client.query(make_gene_query('gene', 'disease', 'x', genes=('ENSEMBL:2', 'ENSEMBL:1')), verbose=False)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+        query_graph = res["message"]["query_graph"]
+        self.assertEqual(set(query_graph["nodes"]), {'gene', 'disease'})
+        self.assertEqual(query_graph["edges"]["x"]["subject"], 'gene')
+
+    def test_relabel_results(self):
+        response = make_gene_query()["message"]
+        response["results"] = [{"node_bindings": {"n0": [{"id": 'ENSEMBL:1'}]}, "edge_bindings": {"e0": [{"id": 'kg0'}]}}]
+        message = relabel_message(response, make_gene_query('gene', 'disease', 'x')["message"])
+        self.assertEqual(set(message["results"][0]["node_bindings"]), {'gene'})
+        self.assertEqual(set(message["results"][0]["edge_bindings"]), {'x'})
+        self.assertIsNone(relabel_message(response, make_gene_query(reverse=True)["message"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import os
+import tempfile
+import time
+
+from chp_client import get_client, trapi_constants
+from chp_client.snapshot import write_snapshot, snapshot_path
+from chp_client import handshake
+
+from standin import CONSTANTS, use_temporary_cache_dir, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestTrapiConstants(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = os.environ.get('CHP_CLIENT_CACHE_DIR')
+        os.environ['CHP_CLIENT_CACHE_DIR'] = self._tmp_dir.name
+        trapi_constants._constants = None
+        trapi_constants.ENDPOINT_URL = self.server.url
+
+    def tearDown(self):
+        # Let a background refresh finish before its cache directory goes away.
+        while trapi_constants._refreshing:
+            time.sleep(0.01)
+        trapi_constants._constants = None
+        trapi_constants.ENDPOINT_URL = None
+        if self._env is None:
+            del os.environ['CHP_CLIENT_CACHE_DIR']
+        else:
+            os.environ['CHP_CLIENT_CACHE_DIR'] = self._env
+        self._tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_fresh_snapshot_is_used_offline(self):
+        write_snapshot('trapi_constants', {"BIOLINK_GENE": 'biolink:GeneFromSnapshot'})
+        self.assertEqual(trapi_constants.BIOLINK_GENE, 'biolink:GeneFromSnapshot')
+        self.assertEqual(trapi_constants.BIOLINK_DISEASE, 'biolink:Disease')
+        self.assertFalse(trapi_constants._refreshing)
+        self.assertEqual(self.server.requests, [])
+        with self.assertRaises(AttributeError):
+            trapi_constants.NOT_A_CONSTANT
+
+    def test_missing_snapshot_refreshes_in_background(self):
+        # The defaults are served right away while the endpoint is asked in the background.
+        self.assertEqual(trapi_constants.BIOLINK_DRUG, 'biolink:Drug')
+        while trapi_constants._refreshing:
+            time.sleep(0.01)
+        self.assertEqual(trapi_constants.BIOLINK_DRUG, CONSTANTS["BIOLINK_DRUG"])
+        self.assertTrue(os.path.exists(snapshot_path('trapi_constants')))
+        self.assertIn('/constants/', self.server.requests)
+
+
+class TestCurieCatalog(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        handshake.clear_cache()
+
+    def test_lookup(self):
+        with get_client(url=self.server.url) as client:
+            self.assertEqual(
+                    client.catalog.lookup(name=' raf1 '),
+                    [{"curie": 'ENSEMBL:ENSG00000132155', "name": 'RAF1', "categories": ['biolink:Gene']}])
+            self.assertEqual(client.catalog.lookup(name='RAF1', category='biolink:Drug'), [])
+            self.assertEqual(client.catalog.name('CHEMBL:CHEMBL88'), 'CYCLOPHOSPHAMIDE')
+            self.assertEqual(len(client.catalog.lookup(category='biolink:Gene')), 2)
+            self.assertEqual(client.catalog.members('biolink:Drug'), ['CHEMBL:CHEMBL88'])
+            self.assertNotIn('CURIE:0', client.catalog)
+        self.assertEqual(self.server.requests.count('/curies/'), 1)
+
+    def test_persisted_until_versions_change(self):
+        for _ in range(2):
+            with get_client(url=self.server.url, handshake_ttl=0) as client:
+                self.assertEqual(len(client.catalog), 3)
+        self.assertEqual(self.server.requests.count('/curies/'), 1)
+        self.server.chp_version = '3.0.1'
+        with get_client(url=self.server.url, handshake_ttl=0) as client:
+            self.assertEqual(len(client.catalog), 3)
+        self.assertEqual(self.server.requests.count('/curies/'), 2)
+
+    def test_live_client_notices_upgrades(self):
+        with get_client(url=self.server.url, version_ttl=0) as client:
+            self.assertEqual(len(client.catalog), 3)
+            self.assertEqual(len(client.catalog), 3)
+            self.assertEqual(self.server.requests.count('/curies/'), 1)
+            self.server.chp_version = '3.0.1'
+            self.assertEqual(len(client.catalog), 3)
+        self.assertEqual(self.server.requests.count('/curies/'), 2)
+
+    def test_fuzzy_resolution(self):
+        with get_client(url=self.server.url) as client:
+            best = client.catalog.search('raf-1', limit=1)[0]
+            self.assertEqual(best["curie"], 'ENSEMBL:ENSG00000132155')
+            self.assertLess(best["score"], 1.0)
+            self.assertEqual(client.catalog.search('RAF1', limit=1)[0]["score"], 1.0)
+            self.assertEqual(client.catalog.search('cyclophosphamid', category='biolink:Gene'), [])
+            self.assertEqual([m["name"] for m in client.catalog.complete('ma')], ['MAP3K13'])
+            self.assertEqual(
+                    client.resolve_names(['raf1', 'Cyclophosphamid', 'no such gene', 'RAF1']),
+                    ['ENSEMBL:ENSG00000132155', 'CHEMBL:CHEMBL88', None, 'ENSEMBL:ENSG00000132155'])
+        self.assertEqual(self.server.requests.count('/curies/'), 1)
+
+    def test_async_client(self):
+        client = get_client(url=self.server.url, async_=True)
+        try:
+            self.assertEqual(client.catalog.name('ENSEMBL:ENSG00000073803'), 'MAP3K13')
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
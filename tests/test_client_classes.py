@@ -0,0 +1,93 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import asyncio
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import chp_client
+from chp_client import get_client
+
+from standin import use_temporary_cache_dir, make_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestClientClasses(StandInServerTestCase):
+    def test_classes_are_memoized(self):
+        self.assertIs(get_client(instance=False), get_client('default', instance=False))
+        self.assertIs(get_client(instance=False), chp_client.DefaultClient)
+        self.assertIs(get_client(instance=False, async_=True), chp_client.AsyncDefaultClient)
+        with get_client(url=self.server.url) as client:
+            self.assertIsInstance(client, chp_client.DefaultClient)
+        self.assertIs(pickle.loads(pickle.dumps(chp_client.DefaultClient)), chp_client.DefaultClient)
+
+    def test_settings_change_builds_new_class(self):
+        settings = chp_client.CLIENT_SETTINGS["default"]
+        original = settings["class_kwargs"]
+        try:
+            settings["class_kwargs"] = dict(original, _default_url=self.server.url)
+            _class = get_client(instance=False)
+            self.assertIsNot(_class, chp_client.DefaultClient)
+            self.assertEqual(_class._default_url, self.server.url)
+        finally:
+            settings["class_kwargs"] = original
+        self.assertIs(get_client(instance=False), chp_client.DefaultClient)
+
+
+def _query_in_worker(client, query):
+    with client:
+        return client.query(query, verbose=False)
+
+
+class TestPickling(StandInServerTestCase):
+    def test_round_trip(self):
+        with get_client(
+                url=self.server.url,
+                handshake_ttl=0,
+                hedging=True,
+                rate_limit=100,
+                compression='gzip',
+                timeout=5) as client:
+            copy = pickle.loads(pickle.dumps(client))
+        # The handshake travels with the client, so the copy does not repeat it.
+        self.assertEqual(self.server.requests.count('/versions/'), 1)
+        with copy:
+            self.assertIsInstance(copy, chp_client.DefaultClient)
+            self.assertEqual(copy._compression, 'gzip')
+            self.assertEqual(copy._timeout, 5)
+            res = copy.query(make_query(), verbose=False)
+        # Each client closes the Hedger it owns.
+        self.assertTrue(client._hedger._executor._shutdown)
+        self.assertTrue(copy._hedger._executor._shutdown)
+        self.assertEqual(res["message"], make_query()["message"])
+
+    def test_async_round_trip(self):
+        client = get_client(url=self.server.url, async_=True, max_workers=3)
+        copy = pickle.loads(pickle.dumps(client))
+        client.close()
+        self.assertIsInstance(copy, chp_client.AsyncDefaultClient)
+        self.assertEqual(copy._max_workers, 3)
+        res = asyncio.run(copy.query(make_query(), verbose=False))
+        copy.close()
+        self.assertEqual(res["message"], make_query()["message"])
+
+    def test_process_pool(self):
+        with get_client(url=self.server.url, urls=[self.server.url]) as client:
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                results = list(pool.map(_query_in_worker, [client] * 3, [make_query(i) for i in range(3)]))
+        self.assertEqual([r["message"] for r in results], [make_query(i)["message"] for i in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+
+from chp_client import get_client
+from chp_client.exceptions import VersionMismatchError
+from chp_client import handshake
+
+from standin import use_temporary_cache_dir, make_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestVersionHandshake(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        handshake.clear_cache()
+
+    def test_handshake_is_cached(self):
+        for _ in range(3):
+            get_client(url=self.server.url).close()
+        self.assertEqual(self.server.requests.count('/versions/'), 1)
+        # A new process only has the on-disk snapshot.
+        handshake.clear_cache()
+        get_client(url=self.server.url).close()
+        self.assertEqual(self.server.requests.count('/versions/'), 1)
+
+    def test_mismatch_raises(self):
+        self.server.version = '0.0.0'
+        with self.assertRaises(VersionMismatchError):
+            get_client(url=self.server.url)
+
+    def test_lazy_check(self):
+        with get_client(url=self.server.url, version_check='lazy') as client:
+            self.assertEqual(self.server.requests, [])
+            client.query(make_query(), verbose=False)
+        self.assertEqual(self.server.requests, ['/versions/', '/query/'])
+
+    def test_background_check_mismatch(self):
+        self.server.version = '0.0.0'
+        with get_client(url=self.server.url, version_check='background') as client:
+            with self.assertRaises(VersionMismatchError):
+                client.query(make_query(), verbose=False)
+        self.assertNotIn('/query/', self.server.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import os
+import subprocess
+import sys
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_time_budget(self):
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils', 'benchmark_import_time.py')
+        proc = subprocess.run(
+                [sys.executable, script, '--runs', '3'],
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+                )
+        self.assertEqual(proc.returncode, 0, proc.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,282 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import multiprocessing
+import os
+import tempfile
+import time
+
+from chp_client import get_client
+from chp_client.retry import RetryPolicy, CircuitBreakerRegistry
+from chp_client.hedging import Hedger
+from chp_client.ratelimit import TokenBucket, SharedTokenBucket
+from chp_client.deadline import Deadline
+from chp_client.exceptions import ChpResponseError, CircuitOpenError, DeadlineExceeded
+
+from standin import StandInChpServer, use_temporary_cache_dir, make_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestRetries(StandInServerTestCase):
+    def test_retry_transient_error(self):
+        with get_client(url=self.server.url, retry_policy=RetryPolicy(attempts=3, backoff=0.01)) as client:
+            self.server.fail_next = 2
+            res = client.query(make_query(), verbose=False)
+        self.assertEqual(res["message"], make_query()["message"])
+        self.assertEqual(self.server.requests.count('/query/'), 3)
+
+    def test_retries_exhausted(self):
+        with get_client(url=self.server.url, retry_policy=RetryPolicy(attempts=2, backoff=0.01)) as client:
+            self.server.fail_next = 5
+            with self.assertRaises(ChpResponseError) as cm:
+                client.query(make_query(), verbose=False)
+        self.assertEqual(cm.exception.status_code, 502)
+        self.assertEqual(self.server.requests.count('/query/'), 2)
+
+    def test_circuit_breaker(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+        with get_client(
+                url=self.server.url,
+                retry_policy=RetryPolicy(attempts=1),
+                circuit_breakers=breakers) as client:
+            self.server.fail_next = 2
+            for _ in range(2):
+                with self.assertRaises(ChpResponseError):
+                    client.query(make_query(), verbose=False)
+            with self.assertRaises(CircuitOpenError):
+                client.query(make_query(), verbose=False)
+            # Only the query endpoint's breaker is open.
+            client.curies(verbose=False)
+        self.assertEqual(self.server.requests.count('/query/'), 2)
+
+    def test_caller_errors_do_not_open_breaker(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+        with get_client(url=self.server.url, circuit_breakers=breakers, coalesce=False) as client:
+            for _ in range(3):
+                with self.assertRaises(TypeError):
+                    client.query({"message": object()}, verbose=False)
+            client.query(make_query(), verbose=False)
+        self.assertEqual(set(breakers.states().values()), {'closed'})
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+
+
+class TestDeadlines(StandInServerTestCase):
+    def test_timeout_is_retried(self):
+        with get_client(url=self.server.url, retry_policy=RetryPolicy(attempts=2, backoff=0)) as client:
+            self.server.slow_next = 1
+            start = time.monotonic()
+            res = client.query(make_query(), timeout=0.2, verbose=False)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(res["message"], make_query()["message"])
+
+    def test_query_deadline(self):
+        with get_client(url=self.server.url) as client:
+            self.server.slow_next = 1
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                client.query(make_query(), deadline=0.2, verbose=False)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+
+    def test_deadline_does_not_open_breaker(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+        with get_client(url=self.server.url, circuit_breakers=breakers) as client:
+            self.server.slow_next = 3
+            for i in range(3):
+                with self.assertRaises(DeadlineExceeded):
+                    client.query(make_query(i), deadline=0.2, verbose=False)
+            res = client.query(make_query(), verbose=False)
+        self.assertEqual(res["message"], make_query()["message"])
+        self.assertEqual(set(breakers.states().values()), {'closed'})
+
+    def test_query_all_partial_results(self):
+        queries = [make_query(i) for i in range(6)]
+        with get_client(url=self.server.url) as client:
+            self.server.slow_next = 1
+            start = time.monotonic()
+            res = client.query_all(queries, chunk_size=2, max_workers=3, deadline=0.3, verbose=False)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertTrue(res["partial"])
+        self.assertEqual(len(res["missing"]), 2)
+        for i, message in enumerate(res["message"]):
+            if i in res["missing"]:
+                self.assertIsNone(message)
+            else:
+                self.assertEqual(message, queries[i]["message"])
+
+    def test_query_many_shared_deadline(self):
+        deadline = Deadline(0.3)
+        with get_client(url=self.server.url) as client:
+            self.server.slow_next = 1
+            results = list(client.query_many(
+                [make_query(i) for i in range(4)], max_workers=1, deadline=deadline, verbose=False))
+            # The budget is spent, so later calls sharing it are not sent.
+            requests_sent = len(self.server.requests)
+            with self.assertRaises(DeadlineExceeded):
+                client.query(make_query(), deadline=deadline, verbose=False)
+        self.assertTrue(all(isinstance(r, DeadlineExceeded) for r in results))
+        self.assertEqual(len(self.server.requests), requests_sent)
+
+
+class TestHedging(StandInServerTestCase):
+    def test_hedge_wins_over_slow_request(self):
+        hedger = Hedger(percentile=50, min_delay=0.2, min_samples=3)
+        with get_client(url=self.server.url, hedging=hedger) as client:
+            for i in range(5):
+                client.query(make_query(i), verbose=False)
+            self.assertEqual(client.hedging_stats()["hedges_fired"], 0)
+            self.server.slow_next = 1
+            start = time.monotonic()
+            res = client.query(make_query(), verbose=False)
+            elapsed = time.monotonic() - start
+            stats = client.hedging_stats()
+        hedger.close()
+        self.assertEqual(res["message"], make_query()["message"])
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(stats["hedges_fired"], 1)
+        self.assertEqual(stats["hedges_won"], 1)
+
+    def test_hedges_a_half_open_breaker_trial(self):
+        hedger = Hedger(percentile=50, min_delay=0.2, min_samples=1)
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=0.3)
+        with get_client(
+                url=self.server.url,
+                hedging=hedger,
+                retry_policy=RetryPolicy(attempts=1),
+                circuit_breakers=breakers) as client:
+            client.query(make_query(), verbose=False)
+            self.server.fail_next = 1
+            with self.assertRaises(ChpResponseError):
+                client.query(make_query(1), verbose=False)
+            time.sleep(0.35)
+            # The trial request times out, and its hedge answers.
+            self.server.slow_next = 1
+            res = client.query(make_query(2), timeout=0.5, verbose=False)
+            self.assertEqual(res["message"], make_query(2)["message"])
+            self.assertEqual(set(breakers.states().values()), {'closed'})
+        hedger.close()
+
+    def test_requests_are_not_capped_by_hedge_threads(self):
+        hedger = Hedger(min_delay=5, min_samples=1, max_workers=1)
+        with get_client(url=self.server.url, hedging=hedger) as client:
+            client.query(make_query(), verbose=False)
+            self.server.slow_next = 4
+            start = time.monotonic()
+            list(client.query_many([make_query(i) for i in range(4)], max_workers=4, verbose=False))
+            elapsed = time.monotonic() - start
+        hedger.close()
+        # The four slow requests ran side by side, not one after another.
+        self.assertLess(elapsed, 2.5)
+
+
+class TestLoadBalancing(StandInServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.replica = StandInChpServer()
+
+    def tearDown(self):
+        self.replica.stop()
+        super().tearDown()
+
+    def test_spreads_queries(self):
+        with get_client(urls=[self.server.url, self.replica.url], balancing='least_outstanding') as client:
+            list(client.query_many([make_query(i) for i in range(20)], max_workers=4, verbose=False))
+        self.assertGreater(self.server.requests.count('/query/'), 0)
+        self.assertGreater(self.replica.requests.count('/query/'), 0)
+
+    def test_eject_and_reprobe(self):
+        with get_client(
+                urls=[self.server.url, self.replica.url],
+                retry_policy=RetryPolicy(attempts=3, backoff=0)) as client:
+            client._balancer.eject_after = 1
+            client._balancer.eject_timeout = 0.05
+            client._balancer.max_eject_timeout = 0.1
+            self.replica.fail_next = 1000
+            for i in range(10):
+                res = client.query(make_query(i), verbose=False)
+                self.assertEqual(res["message"], make_query(i)["message"])
+            stats = {s["url"]: s for s in client.endpoint_stats()}
+            self.assertFalse(stats[self.replica.url]["healthy"])
+            self.assertLessEqual(self.replica.requests.count('/query/'), 3)
+            # Once the replica recovers a probe of /versions/ brings it back.
+            self.replica.fail_next = 0
+            time.sleep(0.2)
+            client.query(make_query(), verbose=False)
+            time.sleep(0.1)
+            stats = {s["url"]: s for s in client.endpoint_stats()}
+            self.assertTrue(stats[self.replica.url]["healthy"])
+
+    def test_open_breaker_fails_over(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=60)
+        with get_client(urls=[self.server.url, self.replica.url], circuit_breakers=breakers) as client:
+            self.assertEqual(client._balancer.eject_timeout, 60)
+            breakers.get(self.replica.url + '/query/').record_failure()
+            for i in range(10):
+                client.query(make_query(i), verbose=False)
+            # Skipping the replica is neither a success nor a failure of it.
+            stats = {s["url"]: s for s in client.endpoint_stats()}
+            self.assertEqual((stats[self.replica.url]["outstanding"], stats[self.replica.url]["failures"]), (0, 0))
+            # With every replica's breaker open, the error reaches the caller.
+            breakers.get(self.server.url + '/query/').record_failure()
+            with self.assertRaises(CircuitOpenError):
+                client.query(make_query(), verbose=False)
+        self.assertEqual(self.server.requests.count('/query/'), 10)
+        self.assertEqual(self.replica.requests.count('/query/'), 0)
+
+
+def _drain_bucket(bucket, n):
+    for _ in range(n):
+        bucket.acquire()
+
+
+class TestRateLimit(StandInServerTestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=50, burst=2)
+        start = time.monotonic()
+        _drain_bucket(bucket, 7)
+        # Two tokens come from the burst, the other five at 50 per second.
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_client_rate_limit(self):
+        with get_client(url=self.server.url, rate_limit=50, rate_burst=1) as client:
+            start = time.monotonic()
+            list(client.query_many([make_query(i) for i in range(6)], max_workers=3, verbose=False))
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_rate_limit_honours_deadline(self):
+        self.assertFalse(TokenBucket(rate=0.5, burst=1).acquire(2, timeout=0.2))
+        with get_client(url=self.server.url, rate_limit=0.5, rate_burst=2) as client:
+            client.query(make_query(0), verbose=False)
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                client.query(make_query(1), deadline=0.2, verbose=False)
+        # The token would only come after the budget, so the call gives up without waiting.
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(self.server.requests.count('/query/'), 1)
+
+    def test_shared_bucket_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bucket = SharedTokenBucket(os.path.join(tmp_dir, 'bucket.json'), rate=50, burst=1)
+            start = time.monotonic()
+            workers = [multiprocessing.Process(target=_drain_bucket, args=(bucket, 5)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            # Both processes draw on one budget: 10 tokens at 50 per second after a burst of one.
+            self.assertGreaterEqual(time.monotonic() - start, 0.17)
+
+
+if __name__ == '__main__':
+    unittest.main()
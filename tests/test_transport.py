@@ -0,0 +1,217 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import asyncio
+import json
+
+from chp_client import get_client, build_session
+from chp_client.batching import AdaptiveChunkSizer
+from chp_client.streaming import iter_json_array_items
+from chp_client.transport import Http2Transport, http2_avail
+from chp_client._version import __version__
+
+from standin import CURIES, use_temporary_cache_dir, make_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestPooledSession(StandInServerTestCase):
+    def test_keep_alive(self):
+        with get_client(url=self.server.url) as client:
+            for i in range(5):
+                res = client.query(make_query(i), verbose=False)
+                self.assertEqual(res["message"], make_query(i)["message"])
+            client.curies(verbose=False)
+        # Version handshake plus all the queries ride a single connection.
+        self.assertEqual(self.server.connections, 1)
+
+    def test_shared_session(self):
+        session = build_session(pool_maxsize=2)
+        clients = [get_client(url=self.server.url, session=session) for _ in range(3)]
+        for client in clients:
+            client.query(make_query(), verbose=False)
+            client.close()
+        self.assertEqual(self.server.connections, 1)
+        # Closing a client must not close a session it does not own.
+        clients[0].query(make_query(), verbose=False)
+        session.close()
+
+
+class TestThreadedQueryMany(StandInServerTestCase):
+    def test_ordered(self):
+        with get_client(url=self.server.url) as client:
+            results = list(client.query_many([make_query(i) for i in range(20)], max_workers=4, verbose=False))
+        self.assertEqual([r["message"] for r in results], [make_query(i)["message"] for i in range(20)])
+
+    def test_unordered(self):
+        with get_client(url=self.server.url) as client:
+            results = dict(client.query_many(
+                [make_query(i) for i in range(20)], max_workers=4, ordered=False, verbose=False))
+        self.assertEqual(sorted(results), list(range(20)))
+        for i, res in results.items():
+            self.assertEqual(res["message"], make_query(i)["message"])
+
+    def test_bounded_in_flight(self):
+        consumed = []
+
+        def queries():
+            for i in range(100):
+                consumed.append(i)
+                yield make_query(i)
+
+        with get_client(url=self.server.url) as client:
+            results = client.query_many(queries(), max_workers=2, max_in_flight=3, verbose=False)
+            next(results)
+            # One yielded plus at most three in flight.
+            self.assertLessEqual(len(consumed), 4)
+            results.close()
+
+
+class TestChunkedQueryAll(StandInServerTestCase):
+    def test_chunks_reassembled_in_order(self):
+        queries = [make_query(i) for i in range(25)]
+        expected = [q["message"] for q in queries]
+        with get_client(url=self.server.url) as client:
+            res = client.query_all(queries, chunk_size=4, max_workers=3, verbose=False)
+        self.assertEqual(res["message"], expected)
+        self.assertEqual(self.server.requests.count('/queryall/'), 7)
+
+    def test_max_chunk_bytes(self):
+        queries = [make_query(i) for i in range(10)]
+        message_bytes = len(json.dumps(queries[0]["message"]))
+        with get_client(url=self.server.url) as client:
+            res = client.query_all(queries, max_chunk_bytes=2 * message_bytes, verbose=False)
+        self.assertEqual(len(res["message"]), 10)
+        self.assertEqual(self.server.requests.count('/queryall/'), 5)
+
+    def test_adaptive_sizer(self):
+        sizer = AdaptiveChunkSizer(10, target_latency=1.0)
+        # Fast chunks grow the size, at most doubling each time.
+        sizer.observe(10, 0.1)
+        self.assertEqual(sizer.size, 20)
+        # Slow chunks shrink it, at most halving each time.
+        for _ in range(10):
+            sizer.observe(sizer.size, 10.0)
+        self.assertLess(sizer.size, 10)
+
+
+class TestPayloadAssembly(StandInServerTestCase):
+    def test_queries_not_mutated(self):
+        queries = [make_query(i) for i in range(5)]
+        with get_client(url=self.server.url) as client:
+            client.query(queries[0], max_results=5, verbose=False)
+            client.query_all(queries, verbose=False)
+        self.assertEqual(queries, [make_query(i) for i in range(5)])
+
+    def test_streamed_body(self):
+        queries = [make_query(i) for i in range(50)]
+        with get_client(url=self.server.url, stream_requests=True) as client:
+            res = client.query_all(queries, verbose=False)
+            single = client.query(queries[0], max_results=3, verbose=False)
+        self.assertEqual(res["message"], [q["message"] for q in queries])
+        self.assertEqual(single["max_results"], 3)
+
+
+class TestStreamingQueryAll(StandInServerTestCase):
+    def test_iter_json_array_items(self):
+        obj = {"status": 'ok', "message": [{"a": '}]"\\'}, [1, 2], 3.5, None], "trailer": {"message": 1}}
+        body = json.dumps(obj).encode()
+        # Feed the parser one byte at a time.
+        items = list(iter_json_array_items((body[i:i + 1] for i in range(len(body))), 'message'))
+        self.assertEqual(items, obj["message"])
+
+    def test_stream(self):
+        queries = [make_query(i) for i in range(30)]
+        with get_client(url=self.server.url) as client:
+            messages = client.query_all(queries, stream=True, chunk_size=7, verbose=False)
+            self.assertEqual(next(messages), queries[0]["message"])
+            self.assertEqual(list(messages), [q["message"] for q in queries[1:]])
+
+
+class TestCompression(StandInServerTestCase):
+    def test_gzip_round_trip(self):
+        queries = [make_query(i) for i in range(50)]
+        with get_client(url=self.server.url, compression='gzip') as client:
+            client.transfer_stats(reset=True)
+            res = client.query_all(queries, verbose=False)
+            stats = client.transfer_stats()
+        self.assertEqual(res["message"], [q["message"] for q in queries])
+        self.assertEqual(stats["requests"], 1)
+        self.assertLess(stats["sent_wire_bytes"], stats["sent_logical_bytes"])
+        self.assertLess(stats["received_wire_bytes"], stats["received_logical_bytes"])
+
+    def test_streamed_gzip(self):
+        queries = [make_query(i) for i in range(50)]
+        with get_client(url=self.server.url, compression='gzip', stream_requests=True) as client:
+            client.transfer_stats(reset=True)
+            messages = list(client.query_all(queries, stream=True, verbose=False))
+            stats = client.transfer_stats()
+        self.assertEqual(messages, [q["message"] for q in queries])
+        self.assertLess(stats["sent_wire_bytes"], stats["sent_logical_bytes"])
+        self.assertLess(stats["received_wire_bytes"], stats["received_logical_bytes"])
+
+    def test_identity(self):
+        with get_client(url=self.server.url, accept_encoding='identity') as client:
+            client.transfer_stats(reset=True)
+            client.query(make_query(), verbose=False)
+            stats = client.transfer_stats()
+        self.assertEqual(stats["received_wire_bytes"], stats["received_logical_bytes"])
+        self.assertEqual(stats["sent_wire_bytes"], stats["sent_logical_bytes"])
+
+
+@unittest.skipUnless(http2_avail, 'httpx and h2 are required for the HTTP/2 transport.')
+class TestHttp2Transport(StandInServerTestCase):
+    def test_endpoint_wrappers(self):
+        # The stand-in only speaks HTTP/1.1, so this checks the transport interface via fallback.
+        transport = Http2Transport()
+        with get_client(url=self.server.url, transport=transport, compression='gzip') as client:
+            res = client.query_all([make_query(i) for i in range(5)], verbose=False)
+            streamed = list(client.query_all([make_query(i) for i in range(5)], stream=True, verbose=False))
+            self.assertEqual(client.curies(verbose=False), CURIES)
+            stats = client.transfer_stats()
+        self.assertEqual(res["message"], [make_query(i)["message"] for i in range(5)])
+        self.assertEqual(streamed, res["message"])
+        self.assertLess(stats["received_wire_bytes"], stats["received_logical_bytes"])
+
+
+class TestAsyncClient(StandInServerTestCase):
+    def test_awaitable_wrappers(self):
+        async def run():
+            async with get_client(url=self.server.url, async_=True) as client:
+                versions = await client.versions(verbose=False)
+                curies = await client.curies(verbose=False)
+                res = await client.query(make_query(), verbose=False)
+                return versions, curies, res
+        versions, curies, res = asyncio.run(run())
+        self.assertEqual(versions["chp_client"], __version__)
+        self.assertEqual(curies, CURIES)
+        self.assertEqual(res["message"], make_query()["message"])
+
+    def test_query_many(self):
+        async def run():
+            async with get_client(url=self.server.url, async_=True) as client:
+                return await client.query_many((make_query(i) for i in range(20)), concurrency=4, verbose=False)
+        results = asyncio.run(run())
+        self.assertEqual([r["message"] for r in results], [make_query(i)["message"] for i in range(20)])
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_concurrency_is_bounded_by_max_workers(self):
+        async def run():
+            async with get_client(url=self.server.url, async_=True, max_workers=2) as client:
+                return await client.query_many([make_query()], concurrency=3, verbose=False)
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+    Source code developed by DI2AG.
+    Thayer School of Engineering at Dartmouth College
+    Authors:    Dr. Eugene Santos, Jr
+                Mr. Chase Yakaboski,
+                Mr. Gregory Hyde,
+                Mr. Luke Veenhuis,
+                Dr. Keum Joo Kim
+"""
+
+import unittest
+import importlib.util
+import os
+import tempfile
+
+from chp_client import get_client
+from chp_client.cache import TieredCache
+from chp_client.fingerprint import fingerprint
+from chp_client.warming import CacheWarmer, iter_grid, iter_grid_spec
+from chp_client.retry import RetryPolicy
+
+from standin import use_temporary_cache_dir, make_query, StandInServerTestCase
+
+
+def setUpModule():
+    use_temporary_cache_dir()
+
+
+class TestCacheWarming(StandInServerTestCase):
+    def test_resumes_from_checkpoint(self):
+        queries = list(iter_grid(make_query, {"i": range(6)}))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'warm.checkpoint')
+            with get_client(url=self.server.url, retry_policy=RetryPolicy(attempts=1)) as client:
+                client._set_caching(cache_db=os.path.join(tmp_dir, 'cache'), verbose=False)
+                self.server.fail_next = 2
+                stats = CacheWarmer(client, checkpoint=checkpoint, max_workers=2).run(queries)
+                self.assertEqual(stats, {"warmed": 4, "skipped": 0, "failed": 2})
+                # A new run only sends what failed.
+                stats = CacheWarmer(client, checkpoint=checkpoint, max_workers=2).run(queries)
+                self.assertEqual(stats, {"warmed": 2, "skipped": 4, "failed": 0})
+                self.assertEqual(self.server.requests.count('/query/'), 8)
+                self.assertEqual(CacheWarmer(client, checkpoint=checkpoint).run(queries)["skipped"], 6)
+                for q in queries:
+                    client.query(q, verbose=False)
+                self.assertEqual(self.server.requests.count('/query/'), 8)
+                client._stop_caching()
+
+    def test_upgrade_warms_again(self):
+        queries = [make_query(i) for i in range(3)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'warm.checkpoint')
+            with get_client(url=self.server.url, version_ttl=0) as client:
+                client._set_caching(cache_db=os.path.join(tmp_dir, 'cache'), verbose=False)
+                self.assertEqual(CacheWarmer(client, checkpoint=checkpoint).run(queries)["warmed"], 3)
+                self.assertEqual(CacheWarmer(client, checkpoint=checkpoint).run(queries)["skipped"], 3)
+                self.server.chp_version = '3.0.1'
+                self.assertEqual(CacheWarmer(client, checkpoint=checkpoint).run(queries)["warmed"], 3)
+                client._stop_caching()
+        self.assertEqual(self.server.requests.count('/query/'), 6)
+
+    def test_requires_cache(self):
+        with get_client(url=self.server.url) as client:
+            with self.assertRaises(ValueError):
+                CacheWarmer(client)
+        with get_client(url=self.server.url, cache=TieredCache()) as client:
+            with self.assertRaises(ValueError):
+                CacheWarmer(client, checkpoint='warm.checkpoint')
+            self.assertEqual(CacheWarmer(client).run([make_query()])["warmed"], 1)
+
+
+class TestGridSpec(unittest.TestCase):
+    SPEC = {
+            "builder": 'build_standard_query',
+            "fixed": {"outcome": 'EFO:0000714', "outcome_op": '>', "disease": 'MONDO:0007254'},
+            "axes": {
+                "genes": [['ENSEMBL:ENSG00000132155'], ['ENSEMBL:ENSG00000073803']],
+                "drugs": [['CHEMBL:CHEMBL88']],
+                "outcome_value": [350, 1000],
+                },
+            }
+
+    def test_unknown_builder(self):
+        for builder in ['build_query', 'get_subject_to_object_predicate_map', 'json']:
+            with self.assertRaises(ValueError):
+                iter_grid_spec(dict(self.SPEC, builder=builder))
+
+    @unittest.skipUnless(importlib.util.find_spec('trapi_model'), 'trapi_model is required to build queries.')
+    def test_documented_spec(self):
+        queries = [q.to_dict() for q in iter_grid_spec(self.SPEC)]
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(len({fingerprint(q) for q in queries}), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
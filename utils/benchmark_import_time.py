@@ -0,0 +1,80 @@
+"""
+Measures the import time of chp_client with python -X importtime and fails when it exceeds a budget.
+
+requests (and so urllib3) is imported first, so that only the time chp_client adds on top of its
+one required dependency is measured. The fastest of several runs is compared against the budget,
+and the run also fails if a heavy optional dependency is pulled in at import time.
+
+Usage: python utils/benchmark_import_time.py [--module chp_client.query] [--budget-ms 40]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported once the features needing them are used.
+LAZY_MODULES = ('trapi_model', 'jsonschema', 'bmt', 'httpx', 'asyncio')
+
+
+def measure(module):
+    """ Imports module in a fresh interpreter after requests and returns (cumulative microseconds,
+    {module imported on top of requests: self microseconds}).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import requests; import {}'.format(module)],
+            env=env,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+            )
+    total = None
+    imported = {}
+    after_requests = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if after_requests:
+            imported[name] = int(self_us)
+        elif name == 'requests':
+            # Everything listed from here on was imported by module itself.
+            after_requests = True
+        if name == module:
+            total = int(cumulative_us)
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='chp_client.query')
+    parser.add_argument('--budget-ms', type=float, default=40.0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to list')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total, imported = min(runs, key=lambda run: run[0])
+    print('import {}: {:.1f} ms on top of requests (best of {}, budget {:.1f} ms)'.format(
+        args.module, total / 1000, args.runs, args.budget_ms))
+    for name, self_us in sorted(imported.items(), key=lambda item: -item[1])[:args.top]:
+        print('  {:8.1f} ms  {}'.format(self_us / 1000, name))
+
+    failed = False
+    eager = sorted(name for name in imported if name.split('.')[0] in LAZY_MODULES)
+    if eager:
+        print('FAIL: imported eagerly: {}'.format(', '.join(eager)))
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print('FAIL: over the import time budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Benchmarks the HTTP/1.1 (requests) transport against the HTTP/2 (httpx) transport.
+
+A local stand-in CHP server (an ASGI app served by hypercorn, which speaks both HTTP/1.1 and
+cleartext HTTP/2) answers /query/ after a simulated compute delay. The same batch of queries is
+then sent through each transport with query_many and the throughput and number of TCP connections
+are reported.
+
+Requires: pip install httpx[http2] hypercorn
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from chp_client import get_client
+from chp_client._version import __version__
+from chp_client.transport import Http2Transport
+
+
+class StandInChp:
+    """ ASGI stand-in for the CHP web service that counts client connections.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.connections = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != 'http':
+            return
+        self.connections.add(tuple(scope["client"]))
+        body = b''
+        while True:
+            event = await receive()
+            body += event.get('body', b'')
+            if not event.get('more_body', False):
+                break
+        if scope["path"] == '/versions/':
+            out = {"chp_client": __version__}
+        else:
+            await asyncio.sleep(self.delay)
+            out = {"message": json.loads(body)["message"]}
+        payload = json.dumps(out).encode()
+        await send({
+            "type": 'http.response.start',
+            "status": 200,
+            "headers": [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())],
+            })
+        await send({"type": 'http.response.body', "body": payload})
+
+
+def start_server(app):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    config = Config()
+    config.bind = ['127.0.0.1:{}'.format(port)]
+    config.loglevel = 'ERROR'
+    # Keep hypercorn from sending GOAWAY after its default 1000 requests per connection.
+    config.keep_alive_max_requests = 10 ** 9
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+    thread = threading.Thread(
+            target=lambda: loop.run_until_complete(serve(app, config, shutdown_trigger=stop.wait)),
+            daemon=True)
+    thread.start()
+    url = 'http://127.0.0.1:{}'.format(port)
+    # Wait for the server to accept connections.
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return url, lambda: loop.call_soon_threadsafe(stop.set)
+
+
+def run(client, queries, concurrency):
+    start = time.monotonic()
+    for _ in client.query_many(queries, max_workers=concurrency, verbose=False):
+        pass
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--delay', type=float, default=0.01, help='simulated server compute time (s)')
+    args = parser.parse_args()
+
+    queries = [{"message": {"query_graph": {"nodes": {"n0": {"ids": ['CURIE:{}'.format(i)]}}, "edges": {}}}}
+            for i in range(args.queries)]
+    transports = {
+            "HTTP/1.1 (requests)": lambda url: get_client(url=url, pool_maxsize=args.concurrency),
+            "HTTP/2 (httpx, h2c)": lambda url: get_client(
+                url=url, transport=Http2Transport(max_connections=args.concurrency, prior_knowledge=True)),
+            }
+    print('{} queries, {} in flight, {}s simulated compute'.format(args.queries, args.concurrency, args.delay))
+    for name, make_client in transports.items():
+        app = StandInChp(args.delay)
+        url, stop = start_server(app)
+        with make_client(url) as client:
+            elapsed = run(client, queries, args.concurrency)
+        stop()
+        print('{:<22} {:8.1f} queries/s  {:4d} connections'.format(
+            name, args.queries / elapsed, len(app.connections)))
+
+
+if __name__ == '__main__':
+    main()
@@ -31,9 +31,10 @@ for i in range(0, TOTAL_QUERIES, step):
     subset_queries.append(queries[i:i+step])
 print([len(subset) for subset in subset_queries])
 
-def query_all(queries):
-    local_client.query_all(queries)
+def query_all(client, queries):
+    client.query_all(queries)
 
+# Clients pickle, so each worker gets its own copy with its own connection pool.
 pool = Pool(TOTAL_WORKERS)
-pool.map(query_all, subset_queries)
+pool.starmap(query_all, [(local_client, subset) for subset in subset_queries])
 '''
@@ -0,0 +1,58 @@
+"""
+Warms a CHP client's persistent response cache from a query corpus or a query grid, so that the
+queries are later answered locally.
+
+The corpus is a pickled list of queries, e.g. all_simple_queries.pk as written by
+build_all_simple_queries_script.py. A grid is a JSON spec expanded by chp_client.warming.iter_grid:
+
+    {"builder": "build_standard_query",
+     "fixed": {"outcome": "EFO:0000714", "outcome_op": ">", "disease": "MONDO:0007254"},
+     "axes": {"genes": [["ENSEMBL:ENSG00000132155"], ["ENSEMBL:ENSG00000073803"]],
+              "drugs": [["CHEMBL:CHEMBL88"]],
+              "outcome_value": [350, 1000]}}
+
+Progress is checkpointed, so rerunning the same command after a crash only sends the queries that
+were not warmed yet, and rerunning it after the endpoint is upgraded warms everything again.
+
+Usage: python utils/warm_cache.py (--corpus all_simple_queries.pk | --grid grid.json)
+           [--url http://127.0.0.1:8000] [--checkpoint warm.checkpoint] [--workers 4]
+"""
+
+import argparse
+import json
+import pickle
+import sys
+
+from chp_client import get_client
+from chp_client.warming import CacheWarmer, iter_grid_spec, DEFAULT_WARMING_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--corpus', help='pickled list of queries')
+    source.add_argument('--grid', help='JSON grid spec')
+    parser.add_argument('--url', default=None, help='CHP endpoint. Default: the public one')
+    parser.add_argument('--cache-db', default=None, help='cache database path without .sqlite')
+    parser.add_argument('--checkpoint', default='warm_cache.checkpoint')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WARMING_WORKERS)
+    parser.add_argument('--max-results', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, 'rb') as f_:
+            queries = pickle.load(f_)
+    else:
+        with open(args.grid) as f_:
+            queries = iter_grid_spec(json.load(f_))
+
+    with get_client(url=args.url) as client:
+        client._set_caching(cache_db=args.cache_db)
+        warmer = CacheWarmer(client, checkpoint=args.checkpoint, max_workers=args.workers, max_results=args.max_results)
+        stats = warmer.run(queries, verbose=True)
+    print(json.dumps(stats))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())